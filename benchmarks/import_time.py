@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# Check the import time of ensemble entrypoints against a budget.
+# This uses python -X importtime, and takes the best of a few runs.
+# Usage: python benchmarks/import_time.py [--repeat 5] [--scale 1.0]
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Budget (milliseconds) for the cumulative import time of each module
+budgets = {
+    "ensemble.client": 50,
+    "ensemble.client.run": 50,
+    "ensemble.members.flux.queue": 150,
+    "ensemble.members.flux.minicluster": 150,
+    "ensemble.server": 400,
+}
+
+# These need flux (and are skipped if it is not installed)
+needs_flux = {"ensemble.members.flux.queue", "ensemble.members.flux.minicluster"}
+
+here = os.path.dirname(os.path.abspath(__file__))
+root = os.path.dirname(here)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Ensemble import time budget")
+    parser.add_argument("--repeat", help="Runs per module (defaults to 5)", default=5, type=int)
+    parser.add_argument(
+        "--scale", help="Multiply budgets (e.g., for a slow machine)", default=1.0, type=float
+    )
+    parser.add_argument("modules", help="Modules to check (defaults to all)", nargs="*")
+    return parser
+
+
+def has_flux():
+    result = subprocess.run([sys.executable, "-c", "import flux"], capture_output=True)
+    return result.returncode == 0
+
+
+def import_time(module):
+    """
+    Import a module in a fresh interpreter, returning cumulative milliseconds.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([root, env.get("PYTHONPATH", "")])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Cannot import {module}:\n{result.stderr}")
+
+    # Lines are "import time: self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    sys.exit(f"Did not find {module} in import time output")
+
+
+def main():
+    args = get_parser().parse_args()
+    modules = args.modules or list(budgets)
+    flux = has_flux()
+
+    over = []
+    for module in modules:
+        if module in needs_flux and not flux:
+            print(f"{module:40} skipped (flux is not installed)")
+            continue
+        budget = budgets.get(module, 100) * args.scale
+        elapsed = min(import_time(module) for _ in range(args.repeat))
+        status = "ok" if elapsed <= budget else "OVER BUDGET"
+        print(f"{module:40} {elapsed:8.1f} ms  (budget {budget:.0f} ms)  {status}")
+        if elapsed > budget:
+            over.append(module)
+
+    if over:
+        sys.exit(f"{len(over)} module(s) over the import time budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,6 +50,12 @@ def get_parser():
         "--name",
         help="Identifier for member (required for minicluster)",
     )
+    run.add_argument(
+        "--uri",
+        help="Flux instance to monitor and submit to (repeat for more, defaults to the current)",
+        dest="uris",
+        action="append",
+    )
     run.add_argument(
         "--debug",
         help="Enable debug logging for the config",
@@ -67,6 +73,50 @@ def get_parser():
         help="Host with server (defaults to localhost)",
         default="localhost",
     )
+    run.add_argument(
+        "--action-workers",
+        help=f"Workers to run actions that wait on the network (defaults to {defaults.action_workers})",
+        default=defaults.action_workers,
+        type=int,
+    )
+    run.add_argument(
+        "--action-max-pending",
+        help=f"Maximum actions waiting for a worker (defaults to {defaults.action_max_pending})",
+        default=defaults.action_max_pending,
+        type=int,
+    )
+    run.add_argument(
+        "--custom-workers",
+        help=f"Workers to run custom actions with a pool (defaults to {defaults.custom_workers})",
+        default=defaults.custom_workers,
+        type=int,
+    )
+    run.add_argument(
+        "--stream",
+        help="Keep one stream open to the server for actions and metric digests",
+        action="store_true",
+        default=False,
+    )
+    run.add_argument(
+        "--resize-window",
+        help=f"Seconds to merge grow and shrink requests, 0 to disable (defaults to {defaults.resize_window_seconds})",
+        default=defaults.resize_window_seconds,
+        type=float,
+    )
+
+    run.add_argument(
+        "--watch",
+        help="Reload the config when the file changes (it is also reloaded on SIGHUP)",
+        action="store_true",
+        default=False,
+    )
+    run.add_argument(
+        "--no-config-cache",
+        help="Do not load (or save) the compiled config in the config cache",
+        dest="config_cache",
+        action="store_false",
+        default=True,
+    )
 
     for command in [run]:
         command.add_argument(
@@ -3,7 +3,19 @@ import ensemble.members as members
 
 def main(args, parser, extra, subparser):
     # Assemble options
-    options = {"name": args.name, "port": args.port, "host": args.host}
+    options = {
+        "name": args.name,
+        "port": args.port,
+        "host": args.host,
+        "action_workers": args.action_workers,
+        "action_max_pending": args.action_max_pending,
+        "custom_workers": args.custom_workers,
+        "resize_window": args.resize_window,
+        "stream": args.stream,
+        "config_cache": args.config_cache,
+        "watch": args.watch,
+        "uris": args.uris,
+    }
 
     # This will raise an error if the member type (e.g., minicluster) is not known
     member = members.get_member(args.executor, options=options)
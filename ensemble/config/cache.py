@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+import ensemble
+from ensemble import schema
+
+
+def get_cache_dir():
+    """
+    Get the directory for the config cache, ENSEMBLE_CACHE_DIR or ~/.cache/ensemble
+    """
+    cache_dir = os.environ.get("ENSEMBLE_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "ensemble")
+
+
+def is_trusted(path):
+    """
+    Determine if a cache path is ours, and only we can write to it.
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return False
+    return info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+class ConfigCache:
+    """
+    A content-addressed cache of validated ensemble configs.
+
+    An entry is keyed by a hash of the config file (as bytes) and anything
+    else that changes what we validate: the debug flag, the ensemble version,
+    and the schema. It holds the validated and normalized config and the
+    parsed rule "when" predicates (as json), so a hit skips parsing yaml and
+    validation. Custom code is compiled from the config source. A new config
+    is a new key, so entries are never stale.
+
+    An entry has the custom code we run, so the directory is only for us
+    (0700), and we ignore entries (or a directory) we don't own, or that
+    others can write to.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or get_cache_dir()
+
+    def digest(self, content, debug=False):
+        """
+        Hash config content (bytes) with the context it is compiled in.
+        """
+        hasher = hashlib.sha256()
+        hasher.update(content)
+        hasher.update(f"debug={debug}".encode("utf-8"))
+        hasher.update(ensemble.__version__.encode("utf-8"))
+        hasher.update(json.dumps(schema.ensemble_config_schema, sort_keys=True).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, digest):
+        """
+        Get a cache entry, or None if we don't have it (or cannot read it).
+        """
+        path = self.path(digest)
+        if not is_trusted(self.cache_dir) or not is_trusted(path):
+            return
+        try:
+            with open(path, "r") as fd:
+                entry = json.load(fd)
+        except (OSError, ValueError):
+            return
+
+        # An inequality predicate is a tuple, which json saves as a list
+        entry["predicates"] = [
+            tuple(predicate) if isinstance(predicate, list) else predicate
+            for predicate in entry["predicates"]
+        ]
+        return entry
+
+    def set(self, digest, config):
+        """
+        Save a compiled config. The cache is an optimization, so if we
+        cannot write (e.g., a read-only filesystem) we carry on without it.
+        """
+        entry = config.compiled()
+        try:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            if not is_trusted(self.cache_dir):
+                print(f"Not writing config cache to {self.cache_dir}, others can write to it")
+                return
+
+            # Write to a temporary file (0600) and rename, so a reader never sees half an entry
+            fd, tmpfile = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as handle:
+                json.dump(entry, handle)
+            os.replace(tmpfile, self.path(digest))
+        except Exception as err:
+            print(f"Cannot write config cache to {self.cache_dir}: {err}")
@@ -1,15 +1,10 @@
-import importlib
-import os
-import random
-import shutil
-
-import jsonschema
-
 import ensemble.defaults as defaults
 import ensemble.utils as utils
 from ensemble import schema
+from ensemble.config import sweep
+from ensemble.config.cache import ConfigCache
+from ensemble.config.loader import load_custom, unload_custom
 from ensemble.config.types import Rule
-from ensemble.logger.generate import JobNamer
 
 # Right now assume all executors have the same actions
 script_template = """from ensemble.config.types import Action, Rule
@@ -19,11 +14,24 @@ script_template = """from ensemble.config.types import Action, Rule
 heartbeat_actions = {"grow", "shrink"}
 
 
-def load_config(config_path, debug=False):
+def load_config(config_path, debug=False, use_cache=True):
     """
-    Load the config path, validating with the schema
+    Load the config path, validating with the schema.
+
+    Unless use_cache is False, a config we have compiled before is loaded
+    from the config cache, skipping validation and compilation.
     """
-    cfg = utils.read_yaml(config_path)
+    with open(config_path, "rb") as fd:
+        content = fd.read()
+
+    cache = ConfigCache() if use_cache else None
+    if cache is not None:
+        digest = cache.digest(content, debug)
+        entry = cache.get(digest)
+        if entry is not None:
+            return EnsembleConfig(entry["config"], compiled=entry)
+
+    cfg = utils.read_yaml_string(content)
 
     # On the fly debugging
     if debug:
@@ -31,8 +39,34 @@ def load_config(config_path, debug=False):
             cfg["logging"] = {}
         cfg["logging"]["debug"] = True
 
-    jsonschema.validate(cfg, schema=schema.ensemble_config_schema)
-    return EnsembleConfig(cfg)
+    schema.validate(cfg)
+    config = EnsembleConfig(cfg)
+    if cache is not None:
+        cache.set(digest, config)
+    return config
+
+
+def group_dependencies(group):
+    """
+    Get the groups a job group waits for, as (name, scheme).
+
+    With after, a group waits for all jobs of the other group to finish
+    (afterany), and with afterok for them all to succeed (afterok).
+    """
+    dependencies = []
+    for field, scheme in [("after", "afterany"), ("afterok", "afterok")]:
+        names = group.get(field) or []
+        if isinstance(names, str):
+            names = [names]
+        dependencies += [(name, scheme) for name in names]
+    return dependencies
+
+
+def rule_key(rule):
+    """
+    Identify a rule across configs (the trigger, name, and action).
+    """
+    return (rule.trigger, rule.name, rule.action.name, rule.action.label)
 
 
 class EnsembleConfig:
@@ -41,14 +75,14 @@ class EnsembleConfig:
     for easier access. It's expected to only be loaded once.
     """
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, compiled=None):
         self._cfg = cfg
         self.jobs = {}
         self.rules = {}
 
         # By default, we don't require a heartbeat
         self.require_heartbeat = False
-        self.parse()
+        self.parse(compiled)
 
         # Cache of action names
         self.actions = set()
@@ -104,34 +138,88 @@ class EnsembleConfig:
 
     def customize(self):
         """
-        For custom actions, we need to write to a template
-        file, and then import and make the function available on
+        For custom actions, we import the custom code (with imports added)
+        as a module from memory, and make the functions available on
         the action.
         """
-        # Add imports to the custom script
         script = script_template + self._cfg["custom"]
-        tmpdir = utils.get_tmpdir()
-        script_name = "_".join([random.choice(JobNamer._descriptors) for _ in range(2)])
-        script_path = os.path.join(tmpdir, f"{script_name}.py")
-        utils.write_file(script, script_path)
+        self.custom, self.custom_loader = load_custom(script)
 
-        # module will have custom functions
-        spec = importlib.util.spec_from_file_location(script_name, script_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        self.custom = module
-        shutil.rmtree(tmpdir)
+    def update(self, other):
+        """
+        Update the running config in place from a newly loaded one.
 
-    def parse(self):
+        Rules are matched by trigger, name, and action (name and label).
+        A rule that did not change keeps its Rule object, so repetitions
+        and backoff counters carry over. A rule that changed is replaced,
+        and rules are added and removed. Job groups are replaced. Returns
+        a summary of what changed.
+        """
+        changes = {"added": 0, "removed": 0, "modified": 0, "kept": 0}
+        running = {}
+        for rules in self.rules.values():
+            for rule in rules:
+                running.setdefault(rule_key(rule), []).append(rule)
+
+        updated = {}
+        for trigger, rules in other.rules.items():
+            updated[trigger] = []
+            for rule in rules:
+                matches = running.get(rule_key(rule))
+                previous = matches.pop(0) if matches else None
+                if previous is None:
+                    changes["added"] += 1
+                elif previous._rule != rule._rule:
+                    changes["modified"] += 1
+                else:
+                    # Custom functions come from the new module (it may have changed)
+                    if rule.action.name == "custom":
+                        previous.action.customize(other.custom)
+                    changes["kept"] += 1
+                    rule = previous
+                updated[trigger].append(rule)
+        changes["removed"] = sum(len(rules) for rules in running.values())
+
+        changes["jobs"] = sorted(
+            name
+            for name in set(self.jobs) | set(other.jobs)
+            if self.jobs.get(name) != other.jobs.get(name)
+        )
+        # The old custom module is not used anymore
+        if self.custom is not None and self.custom is not other.custom:
+            unload_custom(self.custom.__name__)
+
+        self._cfg = other._cfg
+        self.rules = updated
+        self.jobs = other.jobs
+        self.custom = other.custom
+        self.custom_loader = other.custom_loader
+        self.predicates = other.predicates
+        self.require_heartbeat = other.require_heartbeat
+        self.upstream = other.upstream
+        return changes
+
+    def compiled(self):
+        """
+        Return what we compiled from the config, for the config cache.
+        """
+        return {"config": self._cfg, "predicates": self.predicates}
+
+    def parse(self, compiled=None):
         """
         Parse config into organized pieces for more efficient lookup.
         """
+        compiled = compiled or {}
         self.custom = None
+        self.custom_loader = None
         if self._cfg.get("custom") is not None:
             self.customize()
 
-        for rule in self._cfg["rules"]:
-            rule = Rule(rule, self.custom)
+        predicates = compiled.get("predicates") or [None] * len(self._cfg["rules"])
+        self.predicates = []
+        for rule, predicate in zip(self._cfg["rules"], predicates):
+            rule = Rule(rule, self.custom, predicate)
+            self.predicates.append(rule.predicate)
 
             # If the rule action is in the heartbeat set, we require heartbeat
             if rule.action.name in heartbeat_actions:
@@ -144,7 +232,50 @@ class EnsembleConfig:
             # Rules are removed when they are performed
             self.rules[rule.trigger].append(rule)
 
+        self.upstream = set()
         for job in self._cfg["jobs"]:
+            self.upstream.update(group_dependencies(job))
+            if not job.get("command") and not job.get("source"):
+                raise ValueError(f"Job group {job['name']} needs a command or a source")
+
+            if job.get("weight") is not None and job["weight"] <= 0:
+                raise ValueError(f"Job group {job['name']} weight must be greater than 0")
+
+            # A sweep command can only use parameters from its matrix, and
+            # a source command is rendered for each record
+            if job.get("matrix"):
+                sweep.check_template(job.get("command") or "", job["matrix"])
+            elif job.get("source") and job.get("command"):
+                sweep.check_template(job["command"])
             if job["name"] not in self.jobs:
                 self.jobs[job["name"]] = []
             self.jobs[job["name"]].append(job)
+        self.check_dependencies()
+
+    def check_dependencies(self):
+        """
+        Ensure groups only wait for groups that exist, and not in a cycle.
+        """
+        waits = {}
+        for name, groups in self.jobs.items():
+            waits[name] = {up for group in groups for up, _ in group_dependencies(group)}
+            for up in waits[name]:
+                if up not in self.jobs:
+                    raise ValueError(f"Job group {name} waits for unknown group {up}")
+
+        # Depth first search, with groups on the current path in visiting
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Job group {name} waits for itself (a cycle)")
+            visiting.add(name)
+            for up in waits[name]:
+                visit(up)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in waits:
+            visit(name)
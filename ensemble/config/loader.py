@@ -0,0 +1,122 @@
+import hashlib
+import importlib
+import importlib.abc
+import importlib.util
+import linecache
+import sys
+import threading
+import time
+
+# Custom modules are named with this prefix and a hash of their source
+module_prefix = "ensemble_custom_"
+
+
+class CustomCodeLoader(importlib.abc.InspectLoader):
+    """
+    Load custom action code from memory.
+
+    The source is compiled once under a synthetic filename that is stable
+    for the same source, and registered with linecache, so tracebacks and
+    inspect show the custom code without a file on disk. Seconds spent
+    compiling and running the module are kept in timings.
+    """
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.filename = f"<{name}>"
+        self.timings = {}
+
+    def get_source(self, fullname):
+        return self.source
+
+    def get_filename(self, fullname):
+        return self.filename
+
+    def get_code(self, fullname):
+        start = time.perf_counter()
+        code = compile(self.source, self.filename, "exec", dont_inherit=True)
+        self.timings["compile"] = time.perf_counter() - start
+        return code
+
+    def exec_module(self, module):
+        code = self.get_code(module.__name__)
+        module.__file__ = self.filename
+        self.register_lines()
+        start = time.perf_counter()
+        exec(code, module.__dict__)
+        self.timings["exec"] = time.perf_counter() - start
+
+    def register_lines(self):
+        """
+        Add the source to linecache. Without a modified time the entry is
+        never checked against (or removed for) a missing file.
+        """
+        lines = self.source.splitlines(keepends=True)
+        linecache.cache[self.filename] = (len(self.source), None, lines, self.filename)
+
+
+class CustomCodeFinder(importlib.abc.MetaPathFinder):
+    """
+    Find custom modules that were registered by name.
+    """
+
+    def __init__(self):
+        self.loaders = {}
+
+    def find_spec(self, fullname, path=None, target=None):
+        loader = self.loaders.get(fullname)
+        if loader is None:
+            return
+        return importlib.util.spec_from_loader(fullname, loader, origin=loader.filename)
+
+
+finder = CustomCodeFinder()
+lock = threading.Lock()
+
+
+def get_module_name(source):
+    """
+    Custom modules are named by source, so the same code has the same name.
+    """
+    return module_prefix + hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+def load_custom(source):
+    """
+    Import custom code as a module, returning the module and its loader.
+
+    The same source imported again returns the module already loaded.
+    """
+    name = get_module_name(source)
+    with lock:
+        if finder not in sys.meta_path:
+            sys.meta_path.append(finder)
+        loader = finder.loaders.get(name)
+        if loader is None:
+            loader = CustomCodeLoader(name, source)
+            finder.loaders[name] = loader
+        module = importlib.import_module(name)
+    return module, loader
+
+
+def unload_custom(name):
+    """
+    Remove a custom module (e.g., replaced on reload), so it can be freed.
+
+    Objects from the module that are still in use (e.g., by an action that
+    is running) keep working, but it cannot be imported by name.
+    """
+    with lock:
+        loader = finder.loaders.pop(name, None)
+        sys.modules.pop(name, None)
+        if loader is not None:
+            linecache.cache.pop(loader.filename, None)
+
+
+def unload_others(name):
+    """
+    Remove every custom module but one.
+    """
+    for other in [other for other in finder.loaders if other != name]:
+        unload_custom(other)
@@ -0,0 +1,162 @@
+import collections
+import csv
+import hashlib
+import json
+import os
+
+import ensemble.defaults as defaults
+from ensemble.config.cache import get_cache_dir
+
+
+class JobSource:
+    """
+    A JobSource streams job records (dicts) from a JSONL or CSV file.
+
+    Records are read ahead into a buffer of at most buffer_size, so memory
+    does not depend on the size of the file. Each line is one record, and a
+    CSV file has a header. We track the offset (in bytes) after the last
+    record that was used, and save it every buffer_size records (and when
+    we stop), so with resume a restart picks up where we left off. If we
+    are killed, records used after the last save are used again.
+
+    The offset is saved for the group and file, with the identity of the
+    file (inode, modified time, and size), so a changed file is read from
+    the start. Once the file is read to the end the offset is removed, so
+    the group can be submitted again.
+    """
+
+    def __init__(self, path, group, fmt=None, buffer_size=None, resume=True):
+        self.path = os.path.abspath(path)
+        self.group = group
+        self.format = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+        self.buffer_size = buffer_size or defaults.source_buffer_size
+        self.resume = resume
+        self.buffer = collections.deque()
+        self.fieldnames = None
+        self.offset = 0
+        self.used = 0
+
+    @property
+    def offset_file(self):
+        key = f"{self.group}\0{self.path}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(get_cache_dir(), "sources", f"{digest}.json")
+
+    def identity(self):
+        """
+        Identify the file, so we don't resume a file that changed.
+        """
+        stat = os.stat(self.path)
+        return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+    def load_offset(self):
+        """
+        Get the saved offset, unless the file changed since we saved it.
+        """
+        try:
+            with open(self.offset_file, "r") as fd:
+                saved = json.load(fd)
+        except (OSError, ValueError):
+            return 0
+        if saved.get("identity") != self.identity():
+            print(f"Source {self.path} changed, reading group {self.group} from the start")
+            return 0
+        return saved.get("offset", 0)
+
+    def save_offset(self):
+        """
+        Save the offset after the last record used.
+        """
+        if not self.resume:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.offset_file), exist_ok=True)
+            tmpfile = f"{self.offset_file}.tmp"
+            with open(tmpfile, "w") as fd:
+                json.dump(
+                    {
+                        "path": self.path,
+                        "group": self.group,
+                        "identity": self.identity(),
+                        "offset": self.offset,
+                    },
+                    fd,
+                )
+            os.replace(tmpfile, self.offset_file)
+        except OSError as err:
+            print(f"Cannot save offset for {self.path}: {err}")
+
+    def clear_offset(self):
+        """
+        Remove the saved offset, when the file was read to the end.
+        """
+        try:
+            os.remove(self.offset_file)
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            print(f"Cannot remove offset for {self.path}: {err}")
+
+    def parse(self, line):
+        """
+        Parse one line into a record, or None for a blank line.
+        """
+        line = line.decode("utf-8").strip()
+        if not line:
+            return
+        if self.format == "csv":
+            values = next(csv.reader([line]))
+            return dict(zip(self.fieldnames, values))
+        return json.loads(line)
+
+    def fill(self, fd):
+        """
+        Read ahead up to buffer_size records, as (record, offset after it).
+        """
+        while len(self.buffer) < self.buffer_size:
+            line = fd.readline()
+            if not line:
+                break
+            record = self.parse(line)
+            if record is not None:
+                self.buffer.append((record, fd.tell()))
+
+    def commit(self, offset):
+        """
+        Mark the records up to an offset as used.
+        """
+        self.offset = offset
+        self.used += 1
+        if self.used % self.buffer_size == 0:
+            self.save_offset()
+
+    def __iter__(self):
+        """
+        Yield records, from the saved offset if we resume.
+
+        The caller commits the offset of a record when it is done with it.
+        The offset is also saved when we stop early (e.g., on terminate).
+        """
+        with open(self.path, "rb") as fd:
+            if self.format == "csv":
+                self.fieldnames = next(csv.reader([fd.readline().decode("utf-8")]))
+            start = self.load_offset() if self.resume else 0
+            if start > fd.tell():
+                print(f"Resuming group {self.group} from {self.path} at offset {start}")
+                fd.seek(start)
+            self.offset = fd.tell()
+
+            done = False
+            try:
+                self.fill(fd)
+                while self.buffer:
+                    record, offset = self.buffer.popleft()
+                    yield record, offset
+                    if not self.buffer:
+                        self.fill(fd)
+                done = True
+            finally:
+                if not done:
+                    self.save_offset()
+            if self.resume:
+                self.clear_offset()
@@ -0,0 +1,83 @@
+import string
+
+
+def iter_values(values):
+    """
+    Yield the values of one parameter, a list or a range.
+
+    A range is a dict with a stop, and optionally a start (defaults to 0)
+    and step (defaults to 1). Like a Python range, the stop is not included,
+    but the values can be floats.
+    """
+    if isinstance(values, list):
+        yield from values
+        return
+    start = values.get("start", 0)
+    stop = values["stop"]
+    step = values.get("step", 1)
+    if step == 0:
+        raise ValueError("A parameter range cannot have a step of 0")
+
+    # Multiply instead of adding, so floats don't accumulate error, and
+    # round them so 0.1 * 3 is 0.3 in a command
+    floats = isinstance(start, float) or isinstance(step, float)
+    i = 0
+    value = start
+    while (step > 0 and value < stop) or (step < 0 and value > stop):
+        yield value
+        i += 1
+        value = start + i * step
+        if floats:
+            value = round(value, 12)
+
+
+def iter_points(matrix):
+    """
+    Yield each point (a dict of parameter values) of a parameter matrix.
+
+    This is the product of the parameters, with the last one changing
+    fastest. Values are generated as we go, so memory does not depend
+    on the number of points.
+    """
+    names = list(matrix)
+    point = {}
+
+    def expand(index):
+        if index == len(names):
+            yield dict(point)
+            return
+        name = names[index]
+        for value in iter_values(matrix[name]):
+            point[name] = value
+            yield from expand(index + 1)
+
+    yield from expand(0)
+
+
+def render(template, point):
+    """
+    Render a templated command (e.g., "echo {x}") for a point.
+    """
+    return template.format(**point)
+
+
+def check_template(template, matrix=None):
+    """
+    Ensure a command template only uses parameters in the matrix.
+
+    Without a matrix (for a source, where we don't know the parameters
+    until we read a record) we check that the template can be parsed, and
+    that it only uses named parameters.
+    """
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(template)]
+    except ValueError as err:
+        raise ValueError(f"Command {template} is not a valid template: {err}")
+    for field in fields:
+        if field is None:
+            continue
+        name = field.split(".")[0].split("[")[0]
+        if not name.isidentifier():
+            raise ValueError(f"Command {template} uses {{{field}}}, which is not a named parameter")
+        if matrix is not None and name not in matrix:
+            raise ValueError(f"Command {template} uses {{{field}}}, which is not a parameter")
@@ -3,15 +3,38 @@ import re
 import ensemble.defaults as defaults
 
 
+def parse_when(when):
+    """
+    Parse a "when" into a predicate, a number (for equality), an
+    (inequality, comparator) tuple, or None to always run.
+    """
+    if when is None or isinstance(when, (int, float)):
+        return when
+    match = re.search(r"(?P<inequality>[<>]=?)\s*(?P<comparator>\w+)", when).groupdict()
+
+    # This could technically be a float value
+    return match["inequality"], float(match["comparator"])
+
+
+def is_number(value):
+    """
+    Determine if a value is a number (a bool is not).
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
 class Rule:
     """
     A rule wraps an action with additional metadata
     """
 
-    def __init__(self, rule, module=None):
+    def __init__(self, rule, module=None, predicate=None):
         self._rule = rule
         self.disabled = False
         self.action = Action(rule["action"], module)
+
+        # The parsed "when" can come from the config cache
+        self.predicate = predicate
         self.validate()
 
     @property
@@ -28,22 +51,19 @@ class Rule:
         to say to run or not.
         """
         # No when is set, so we just continue assuming there is no when
-        if self.when is None:
+        predicate = self.predicate
+        if predicate is None:
             return True
 
         # If we have a direct value, we check for equality
         number = (int, float)
-        if isinstance(self.when, number) and value != self.when:
+        if isinstance(predicate, number) and value != predicate:
             return False
-        if isinstance(self.when, number) and value == self.when:
+        if isinstance(predicate, number) and value == predicate:
             return True
 
-        # Otherwise, parse for inequality
-        match = re.search(r"(?P<inequality>[<>]=?)\s*(?P<comparator>\w+)", self.when).groupdict()
-
-        # This could technically be a float value
-        comparator = float(match["comparator"])
-        inequality = match["inequality"]
+        # Otherwise, it's an inequality
+        inequality, comparator = predicate
         assert inequality in {"<", ">", "<=", ">=", "==", "="}
 
         # Evaluate! Not sure there is a better way than this :)
@@ -63,6 +83,13 @@ class Rule:
         """
         Ensure we have a valid inequality before running anything!
         """
+        # Parse once, unless the config cache gave us the predicate
+        try:
+            if self.predicate is None:
+                self.predicate = parse_when(self.when)
+        except Exception as err:
+            raise ValueError(f"when: for rule {self} is not valid: {err}")
+
         # If a number, we require greater than == 0
         if isinstance(self.when, int) and self.when >= 0:
             return
@@ -81,11 +108,24 @@ class Rule:
         """
         Validate the rule and associated action
         """
+        # The custom pools import this module (for Action)
+        from ensemble.members.custom import pool_types
+
         # Is the action name valid?
         if self.action.name not in defaults.valid_actions:
             raise ValueError(
                 f"Rule trigger {self.trigger} has invalid action name {self.action.name}"
             )
+        if self.action.pool is not None and self.action.pool not in pool_types:
+            raise ValueError(f"Rule trigger {self.trigger} has invalid pool {self.action.pool}")
+        timeout = self.action._action.get("timeout")
+        if timeout is not None and (not is_number(timeout) or timeout <= 0):
+            raise ValueError(f"Rule trigger {self.trigger} has invalid timeout {timeout}")
+        concurrency = self.action._action.get("concurrency")
+        if concurrency is not None and (
+            not is_number(concurrency) or int(concurrency) != concurrency or concurrency < 1
+        ):
+            raise ValueError(f"Rule trigger {self.trigger} has invalid concurrency {concurrency}")
         # Ensure we have a valid number or inequality
         self.check_when()
 
@@ -187,3 +227,24 @@ class Action:
     @property
     def label(self):
         return self._action.get("label")
+
+    @property
+    def pool(self):
+        """
+        A custom action can run in a "thread" or "process" pool
+        """
+        return self._action.get("pool")
+
+    @property
+    def timeout(self):
+        """
+        Seconds to wait for a custom action in a pool (None to wait forever)
+        """
+        return self._action.get("timeout")
+
+    @property
+    def concurrency(self):
+        """
+        How many of this custom action can run in a pool at once
+        """
+        return self._action.get("concurrency") or 1
@@ -1,9 +1,57 @@
 workers = 10
 port = 50051
 
+# Requests doing blocking work at once, for the asyncio server
+max_concurrency = 100
+
 supported_members = ["flux", "minicluster"]
 valid_actions = ["submit", "custom", "terminate", "grow", "shrink"]
 heartbeat_seconds = 60
+
+# Member actions that wait on the network run on a bounded pool
+action_workers = 4
+action_max_pending = 64
+
+# Workers for custom actions that run in a thread or process pool
+custom_workers = 2
+
+# Grow and shrink requests within this many seconds are merged
+resize_window_seconds = 2
+
+# Times the service retries a resize when the MiniCluster changed under it
+resize_retries = 5
+
+# Admission control for actions: requests in flight for the service,
+# and requests per second for each member (with bursts of twice that)
+admission_max_in_flight = 100
+admission_member_rate = 20
+admission_retry_after = 1
+
+# Members retry denied actions with backoff (seconds) and jitter
+action_retries = 5
+action_backoff = 0.5
+action_max_backoff = 30
+
+# New MiniClusters in the memory backend (for testing) have this size and bounds
+memory_size = 1
+memory_min_size = 1
+memory_max_size = 100
+
+# Idempotency keys (of recent requests) the service remembers
+idempotency_keys = 10000
+
+# Jobs submitted at once from the backlog, before the reactor handles events
+submit_chunk_size = 100
+
+# Job records read ahead from a job source (and saved offset frequency)
+source_buffer_size = 1000
+
+# Jobs a barrier job (for group dependencies) waits for, before we chain another
+barrier_fan_in = 1000
+
+# Seconds between checks for changes to the config (with --watch)
+config_watch_seconds = 2
+
 service_account_file = "/var/run/secrets/kubernetes.io/serviceaccount/namespace"
 
 job_events = [
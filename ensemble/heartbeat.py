@@ -1,5 +1,5 @@
 import signal
-import threading
+import time
 
 
 class GracefulExit(Exception):
@@ -10,34 +10,69 @@ class GracefulExit(Exception):
     pass
 
 
-class QueueHeartbeat(threading.Thread):
+class Heartbeat:
     """
-    The Queue Heartbeat triggers at a user specified interval, with the
+    The Heartbeat triggers at a user specified interval, with the
     intention to be able to run events that might not be linked to jobs.
+
+    It does not know about an event loop: schedule(seconds, func) must run
+    func once after seconds (e.g., with a flux timer watcher) and return a
+    function that cancels it. Each beat is a one shot timer that we arm
+    again for the next deadline, and deadlines are on a fixed grid from the
+    start, so time spent in the callback (or a busy loop) does not add up
+    as drift. If we wake up more than an interval late, the beats we missed
+    are counted as skipped (and not run to catch up).
     """
 
-    def __init__(self, interval_seconds, callback, **kwargs):
-        super().__init__()
-        self.stop_event = threading.Event()
+    def __init__(self, interval_seconds, callback, schedule, clock=time.monotonic):
         self.interval_seconds = interval_seconds
         self.callback = callback
-        self.kwargs = kwargs
+        self.schedule = schedule
+        self.clock = clock
+        self.cancel = None
+        self.deadline = None
+
+        # Beats run and skipped, and how late (seconds) the last beat was
+        # and how many beats it missed
+        self.ticks = 0
+        self.skipped = 0
+        self.lateness = 0
+        self.missed = 0
+
+    @property
+    def running(self):
+        return self.cancel is not None
 
-    def run(self):
+    def start(self):
+        self.deadline = self.clock() + self.interval_seconds
+        self.arm()
+
+    def arm(self):
         """
-        Run the heartbeat function, and exit gracefully
+        Schedule the next beat at the deadline.
         """
-        while not self.stop_event.wait(self.interval_seconds):
-            try:
-                self.callback(**self.kwargs)
-            except (KeyboardInterrupt, GracefulExit):
-                break
+        delay = max(0, self.deadline - self.clock())
+        self.cancel = self.schedule(delay, self.beat)
 
-    def stop(self):
+    def beat(self):
         """
-        Explicit stop of the thread, like that will happen :)
+        Run the callback, and arm the timer for the next deadline.
         """
-        self.stop_event.set()
+        self.cancel = None
+        self.lateness = max(0, self.clock() - self.deadline)
+        self.missed = int(self.lateness // self.interval_seconds)
+        self.skipped += self.missed
+        self.deadline += (self.missed + 1) * self.interval_seconds
+        self.ticks += 1
+        try:
+            self.callback(self)
+        finally:
+            self.arm()
+
+    def stop(self):
+        if self.cancel is not None:
+            self.cancel()
+            self.cancel = None
 
 
 def signal_handler(signum, frame):
@@ -48,6 +83,10 @@ def signal_handler(signum, frame):
     raise GracefulExit()
 
 
-# Signals for our heartbeat
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+def install_signal_handlers():
+    """
+    Install signals to exit gracefully. This is done when a member
+    starts, and not on import, so importing has no side effects.
+    """
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
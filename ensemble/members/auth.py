@@ -3,15 +3,21 @@ from contextlib import contextmanager
 import grpc
 
 
+def create_channel(host, use_ssl=False):
+    """
+    Create a channel, either with or without ssl.
+    """
+    if use_ssl:
+        return grpc.secure_channel(host, grpc.ssl_channel_credentials())
+    return grpc.insecure_channel(host)
+
+
 @contextmanager
 def grpc_channel(host, use_ssl=False):
     """
     Yield a channel, either with or without ssl, and close properly.
     """
-    if use_ssl:
-        channel = grpc.secure_channel(host, grpc.ssl_channel_credentials())
-    else:
-        channel = grpc.insecure_channel(host)
+    channel = create_channel(host, use_ssl)
     try:
         yield channel
     finally:
@@ -0,0 +1,99 @@
+import collections
+
+
+class BacklogEntry:
+    """
+    A group with jobs left to submit.
+    """
+
+    def __init__(self, group, jobs):
+        self.group = group
+        self.jobs = jobs
+        self.weight = group.get("weight") or 1
+        self.deficit = 0
+
+        # Is it the turn of this entry (it has had its quantum for the round)
+        self.turn = False
+
+
+class Backlog:
+    """
+    The Backlog holds groups with jobs left to submit, and interleaves
+    them by weighted deficit round robin.
+
+    On its turn, a group adds its weight to its deficit, and submits a job
+    for each whole unit of deficit. A group with weight 2 submits twice
+    as many jobs per round as a group with weight 1, and a weight of 0.5
+    submits a job every other round. Jobs of a group are submitted in
+    order. A group without room in the queue (at its depth) is skipped and
+    its deficit reset, so it cannot save up a burst. If we run out of
+    budget during a turn, the next call continues that turn.
+    """
+
+    def __init__(self, on_done=None):
+        self.entries = collections.deque()
+
+        # Called with a group when all of its jobs were taken
+        self.on_done = on_done
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, group, jobs):
+        self.entries.append(BacklogEntry(group, jobs))
+
+    def close(self):
+        """
+        Close and remove the jobs of every group, so a job source saves
+        the offset of the records that were used.
+        """
+        while self.entries:
+            self.entries.popleft().jobs.close()
+
+    def take(self, budget, has_room):
+        """
+        Yield up to budget (group, job) to submit.
+
+        has_room(group) is checked before each job, so the caller must
+        submit the job before asking for the next one.
+        """
+        blocked = 0
+        while budget > 0 and self.entries and blocked < len(self.entries):
+            entry = self.entries[0]
+            if not has_room(entry.group):
+                entry.deficit = 0
+                entry.turn = False
+                self.entries.rotate(-1)
+                blocked += 1
+                continue
+            blocked = 0
+
+            if not entry.turn:
+                entry.deficit += entry.weight
+                entry.turn = True
+
+            exhausted = False
+            while entry.deficit >= 1 and budget > 0 and has_room(entry.group):
+                job = next(entry.jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                yield entry.group, job
+
+                # The backlog was closed (e.g., on terminate) while we were out
+                if not self.entries:
+                    return
+                entry.deficit -= 1
+                budget -= 1
+
+            if exhausted:
+                self.entries.popleft()
+                if self.on_done is not None:
+                    self.on_done(entry.group)
+                continue
+
+            # Out of budget during our turn, we continue it next time
+            if budget == 0 and entry.deficit >= 1:
+                return
+            entry.turn = False
+            self.entries.rotate(-1)
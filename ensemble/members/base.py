@@ -1,5 +1,9 @@
+import os
+
 import ensemble.config as cfg
 from ensemble.logger import LogColors
+from ensemble.members.custom import CustomActionPool
+from ensemble.members.dispatch import ActionDispatcher
 from ensemble.members.metrics import QueueMetrics
 
 # Examples for status in the future
@@ -12,6 +16,9 @@ class MemberBase:
     The MemberBase is an abstract base to show functions defined.
     """
 
+    # Actions that can wait on the network, and are run by the dispatcher
+    dispatched_actions = set()
+
     def __init__(self, **options):
         """
         Create a new member type (e.g., FluxQueue)
@@ -21,6 +28,13 @@ class MemberBase:
 
         # Common queue metrics
         self.metrics = QueueMetrics()
+
+        # Actions that would block the event loop are handed to workers
+        self.dispatcher = ActionDispatcher(
+            workers=options.get("action_workers"), max_pending=options.get("action_max_pending")
+        )
+        # Custom actions can run in a pool, with results handled by the dispatcher
+        self.custom_pool = CustomActionPool(self.dispatcher, workers=options.get("custom_workers"))
         if not hasattr(self, "rules_supported") or not self.rules_supported:
             raise ValueError("The queue executor needs to have a list of supported rules.")
 
@@ -110,6 +124,8 @@ class MemberBase:
             if not run_action:
                 raise NotImplementedError("Action {rule.action.name} is not supported.")
             self.announce(f"   {rule.action.name} {rule.action.label or ''}")
+            if rule.action.name in self.dispatched_actions:
+                return self.dispatch(rule.action.name, run_action, rule, record)
             run_action(rule, record)
 
         # Note that terminate exits but does not otherwise touch
@@ -118,6 +134,30 @@ class MemberBase:
             self.announce("   terminate ensemble session")
             self.terminate()
 
+    def dispatch(self, name, func, *args, **kwargs):
+        """
+        Hand an action to the dispatcher so the event loop does not wait on it.
+
+        The completion is delivered back to on_action_complete, which runs
+        on the event loop when the member drains the dispatcher.
+        """
+        self.metrics.record_datum("action-queue-depth", self.dispatcher.depth)
+        if not self.dispatcher.submit(
+            name, func, *args, callback=self.on_action_complete, **kwargs
+        ):
+            print(f"Action {name} dropped, {self.dispatcher.depth} actions are already pending")
+            return False
+        return True
+
+    def on_action_complete(self, completion):
+        """
+        Record latency for a dispatched action, and report an error.
+        """
+        self.metrics.record_datum(f"action-{completion.name}-wait", completion.wait)
+        self.metrics.record_datum(f"action-{completion.name}-latency", completion.latency)
+        if completion.error is not None:
+            print(f"Action {completion.name} failed: {completion.error}")
+
     def execute_metric_action(self, rule, record=None):
         """
         Execute a metric action.
@@ -149,11 +189,77 @@ class MemberBase:
         """
         Load and validate the config path
         """
-        self.cfg = cfg.load_config(config_path, debug)
+        self.config_path = config_path
+        self.debug = debug
+        self.config_stat = self.stat_config()
+        use_cache = self.options.get("config_cache", True)
+        self.cfg = cfg.load_config(config_path, debug, use_cache=use_cache)
+
+        # Time to compile and run custom code (once for the same source in a process)
+        if self.cfg.custom_loader is not None:
+            for name, seconds in self.cfg.custom_loader.timings.items():
+                self.metrics.record_datum(f"custom-{name}", seconds)
+
         # All rules that the ensemble provides must be
         # supported by the queue executor
         self.validate_rules()
 
+    def stat_config(self):
+        """
+        Get what we check to see if the config file changed.
+        """
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return
+        return stat.st_mtime_ns, stat.st_size
+
+    def config_changed(self):
+        """
+        Determine if the config file changed since we last loaded it.
+        """
+        current = self.stat_config()
+        if current is None or current == self.config_stat:
+            return False
+        self.config_stat = current
+        return True
+
+    def reload(self):
+        """
+        Reload the config, and update rules and job groups in place.
+
+        Metrics, jobs we are tracking, and unchanged rules (with their
+        repetitions and backoff) are kept. If the new config is not valid,
+        we keep running the old one.
+        """
+        self.config_stat = self.stat_config()
+        use_cache = self.options.get("config_cache", True)
+        try:
+            new_cfg = cfg.load_config(self.config_path, self.debug, use_cache=use_cache)
+            new_cfg.check_supported(self.rules_supported)
+        except Exception as err:
+            print(f"Cannot reload {self.config_path}, keeping the running config: {err}")
+            return
+        heartbeat = self.cfg.heartbeat
+        changes = self.cfg.update(new_cfg)
+        self.announce(" => reload config", color="blue")
+        print(
+            f"   rules: {changes['added']} added, {changes['removed']} removed, "
+            f"{changes['modified']} modified, {changes['kept']} kept"
+        )
+        if changes["jobs"]:
+            print(f"   job groups changed: {', '.join(changes['jobs'])}")
+        if self.cfg.heartbeat != heartbeat:
+            print(f"   heartbeat: {heartbeat} => {self.cfg.heartbeat} seconds")
+            self.setup_heartbeat()
+        return changes
+
+    def setup_heartbeat(self):
+        """
+        Start (or restart) the heartbeat, if the member has one.
+        """
+        pass
+
     def start(self, *args, **kwargs):
         """
         Submit a job
@@ -1,9 +1,68 @@
+import itertools
 import json
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent import futures
 
+import grpc
+
+import ensemble.defaults as defaults
 import ensemble.members.auth as auth
 from ensemble.protos import ensemble_service_pb2, ensemble_service_pb2_grpc
 
 
+def create_action_request(member, name, action, payload):
+    """
+    Create an action request.
+
+    Grow and shrink get a typed resize payload, with an idempotency key so
+    the service does not apply the same request twice. Other actions send
+    the payload as json.
+    """
+    if action not in ["grow", "shrink"]:
+        return ensemble_service_pb2.ActionRequest(
+            member=member, name=name, action=action, payload=json.dumps(payload)
+        )
+
+    delta = abs(payload.get(action) or 1)
+    if action == "shrink":
+        delta = delta * -1
+    resize = ensemble_service_pb2.ResizePayload(
+        group=payload.get("group"),
+        version=payload.get("version"),
+        delta=delta,
+        idempotency_key=payload.get("idempotency_key") or str(uuid.uuid4()),
+    )
+    return ensemble_service_pb2.ActionRequest(
+        member=member, name=name, action=action, resize=resize
+    )
+
+
+def retry_denied(send, retries=None):
+    """
+    Send a request until it is not denied (or we run out of retries).
+
+    We wait at least the retry after hint from the service, and otherwise
+    back off exponentially with (full) jitter, so members that were denied
+    together don't all come back at the same time.
+    """
+    retries = defaults.action_retries if retries is None else retries
+    for attempt in range(retries + 1):
+        response = send()
+        if response.status != ensemble_service_pb2.Response.ResultType.DENIED:
+            return response
+        if attempt == retries:
+            break
+        backoff = min(defaults.action_max_backoff, defaults.action_backoff * 2**attempt)
+        delay = max(response.retry_after, random.uniform(0, backoff))
+        print(f"Action request denied, retrying in {delay:.2f} seconds")
+        time.sleep(delay)
+    return response
+
+
 class EnsembleClient:
     """
     The EnsembleClient is used by members to communicate with the grpc service.
@@ -23,15 +82,141 @@ class EnsembleClient:
         """
         Send an action request to the grpc server.
         """
-        payload = json.dumps(payload)
-
-        # These are submit variables. A more substantial submit script would have argparse, etc.
-        request = ensemble_service_pb2.ActionRequest(
-            member=member, name=name, action=action, payload=payload
-        )
+        request = create_action_request(member, name, action, payload)
 
+        # The request is the same on a retry, so the service won't apply it twice
         with auth.grpc_channel(self.host, self.use_ssl) as channel:
             stub = ensemble_service_pb2_grpc.EnsembleOperatorStub(channel)
-            response = stub.RequestAction(request)
+            response = retry_denied(lambda: stub.RequestAction(request))
             print(f"Action request: {response.status}")
         return response
+
+    def status_request(self, member, name, group=None, version=None):
+        """
+        Ask the grpc server for the status of a member.
+
+        The group and version let the service look up a member it has not seen.
+        """
+        request = ensemble_service_pb2.StatusRequest(
+            member=member,
+            name=name,
+            payload=ensemble_service_pb2.StatusPayload(group=group or "", version=version or ""),
+        )
+        with auth.grpc_channel(self.host, self.use_ssl) as channel:
+            stub = ensemble_service_pb2_grpc.EnsembleOperatorStub(channel)
+            response = stub.RequestStatus(request)
+        return response
+
+    def stream(self, member, name, on_command=None):
+        """
+        Open a long lived stream to the grpc server.
+        """
+        return MemberStream(self.host, member, name, on_command=on_command, use_ssl=self.use_ssl)
+
+
+class MemberStream:
+    """
+    A MemberStream is one long lived (bidirectional) stream to the grpc service.
+
+    Actions and metric digests are sent over it, and the service answers each
+    with a message carrying the same sequence number. Messages the service sends
+    on its own (commands) are handed to on_command, which is called from the
+    thread reading the stream.
+    """
+
+    def __init__(self, host, member, name, on_command=None, use_ssl=False):
+        self.host = host
+        self.member = member
+        self.name = name
+        self.on_command = on_command
+        self.closed = False
+
+        # Futures waiting on an answer, by sequence number
+        self.sequence = itertools.count(1)
+        self.waiting = {}
+        self.lock = threading.Lock()
+
+        self.outbox = queue.SimpleQueue()
+        self.channel = auth.create_channel(host, use_ssl)
+        stub = ensemble_service_pb2_grpc.EnsembleOperatorStub(self.channel)
+        self.responses = stub.Stream(self.iter_messages())
+        self.reader = threading.Thread(target=self.receive, daemon=True)
+        self.reader.start()
+
+    def iter_messages(self):
+        """
+        Yield messages put in the outbox to the stream, until closed.
+        """
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                return
+            yield message
+
+    def send(self, **kwargs):
+        """
+        Send a message, and return a future for the service response.
+        """
+        if self.closed:
+            raise ConnectionError(f"Stream to {self.host} is closed")
+        sequence = next(self.sequence)
+        future = futures.Future()
+        with self.lock:
+            self.waiting[sequence] = future
+        message = ensemble_service_pb2.MemberMessage(
+            member=self.member, name=self.name, sequence=sequence, **kwargs
+        )
+        self.outbox.put(message)
+        return future
+
+    def action_request(self, action, payload, timeout=60):
+        """
+        Send an action request over the stream, and wait for the response.
+        """
+        request = create_action_request(self.member, self.name, action, payload)
+        response = retry_denied(lambda: self.send(action=request).result(timeout))
+        print(f"Action request: {response.status}")
+        return response
+
+    def send_digest(self, payload):
+        """
+        Send a digest of metrics. We don't wait for the acknowledgement.
+        """
+        digest = ensemble_service_pb2.MetricDigest(
+            payload=json.dumps(payload), timestamp=time.time()
+        )
+        return self.send(digest=digest)
+
+    def receive(self):
+        """
+        Read messages from the service until the stream ends.
+        """
+        try:
+            for message in self.responses:
+                # A sequence of 0 is a message the service started
+                if message.sequence == 0:
+                    if self.on_command is not None:
+                        self.on_command(message.command, json.loads(message.payload or "{}"))
+                    continue
+                with self.lock:
+                    future = self.waiting.pop(message.sequence, None)
+                if future is not None:
+                    future.set_result(message.response)
+        except grpc.RpcError as err:
+            print(f"Stream to {self.host} ended: {err.code()}")
+
+        # Anyone still waiting is not going to get an answer
+        self.closed = True
+        with self.lock:
+            waiting = list(self.waiting.values())
+            self.waiting = {}
+        for future in waiting:
+            future.set_exception(ConnectionError(f"Stream to {self.host} closed"))
+
+    def close(self):
+        """
+        Close the stream and channel.
+        """
+        self.closed = True
+        self.outbox.put(None)
+        self.channel.close()
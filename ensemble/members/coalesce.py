@@ -0,0 +1,47 @@
+class ResizeCoalescer:
+    """
+    The resize coalescer merges grow and shrink requests that arrive
+    within a window into one net change in size per target (e.g., a
+    MiniCluster name). Opposing requests cancel out, so a grow followed
+    by a shrink of the same size results in no request at all.
+    """
+
+    def __init__(self):
+        self.deltas = {}
+        self.requests = {}
+
+        # Totals across windows, for the curious
+        self.merged = 0
+        self.cancelled = 0
+
+    @property
+    def empty(self):
+        return not self.deltas
+
+    def add(self, name, delta):
+        """
+        Add a change in size for a target.
+
+        Returns True if this is the first request of a window, meaning
+        the caller should schedule a flush.
+        """
+        opened = self.empty
+        self.deltas[name] = self.deltas.get(name, 0) + delta
+        self.requests[name] = self.requests.get(name, 0) + 1
+        return opened
+
+    def flush(self):
+        """
+        Close the window and return the net (non-zero) delta per target.
+        """
+        deltas = {}
+        for name, delta in self.deltas.items():
+            count = self.requests[name]
+            if delta == 0:
+                self.cancelled += count
+                continue
+            self.merged += count - 1
+            deltas[name] = delta
+        self.deltas = {}
+        self.requests = {}
+        return deltas
@@ -0,0 +1,109 @@
+import multiprocessing
+import time
+from concurrent import futures
+
+import ensemble.defaults as defaults
+from ensemble.config.loader import load_custom, unload_others
+from ensemble.config.types import Action
+
+# Ways a custom action can run outside of the event loop
+pool_types = ["thread", "process"]
+
+
+def run_custom(source, label, kwargs):
+    """
+    Run a custom function in a worker thread or process.
+
+    We import the custom code from source (once per process), so this works
+    in a new process too. A worker process only keeps the custom code it ran
+    last, since it does not see a reload. A follow up action is returned as
+    a dict, since it has to come back to the event loop (and maybe out of a
+    process).
+    """
+    module, _ = load_custom(source)
+    if multiprocessing.parent_process() is not None:
+        unload_others(module.__name__)
+    action = getattr(module, label)(**kwargs)
+    if isinstance(action, Action):
+        return dict(action._action)
+    return action
+
+
+class CustomTask:
+    """
+    A custom action running in a pool.
+    """
+
+    def __init__(self, rule, record=None):
+        self.rule = rule
+        self.record = record
+        self.submitted = time.time()
+        self.future = None
+        self.timer = None
+        self.timed_out = False
+
+
+class CustomActionPool:
+    """
+    Run custom actions on a bounded pool of threads or processes.
+
+    Executors are created on first use. A process pool starts processes
+    with spawn, so workers don't inherit threads (e.g., grpc) from us.
+    When a task finishes, it is posted to the dispatcher, so the member
+    handles the result on its event loop. We count tasks running for each
+    rule, to limit how many of the same action can run at once.
+    """
+
+    def __init__(self, dispatcher, workers=None):
+        self.dispatcher = dispatcher
+        self.workers = workers or defaults.custom_workers
+        self.executors = {}
+        self.running = {}
+
+    def get_executor(self, pool):
+        executor = self.executors.get(pool)
+        if executor is not None:
+            return executor
+        if pool == "process":
+            executor = futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            executor = futures.ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="ensemble-custom"
+            )
+        self.executors[pool] = executor
+        return executor
+
+    def count(self, rule):
+        return self.running.get(rule, 0)
+
+    def submit(self, rule, source, kwargs, callback, record=None):
+        """
+        Submit a custom action, with callback(task) run on the event loop.
+        """
+        task = CustomTask(rule, record)
+        self.running[rule] = self.count(rule) + 1
+        executor = self.get_executor(rule.action.pool)
+        task.future = executor.submit(run_custom, source, rule.action.label, kwargs)
+        task.future.add_done_callback(
+            lambda _: self.dispatcher.post(f"custom-{rule.action.label}", callback, task)
+        )
+        return task
+
+    def release(self, task):
+        """
+        A task is done, so it no longer counts as running.
+
+        A task that timed out is only released when its future is done (or
+        cancelled), since a thread cannot be stopped, so it still holds its
+        place under the concurrency and worker limits until then.
+        """
+        self.running[task.rule] = max(0, self.count(task.rule) - 1)
+
+    def shutdown(self):
+        """
+        Stop taking actions. Those already running are not waited for.
+        """
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,163 @@
+import os
+import queue
+import time
+from concurrent import futures
+
+import ensemble.defaults as defaults
+
+
+class Completion:
+    """
+    A completion holds the result (or error) of a dispatched action,
+    along with timing for how long it waited and ran.
+    """
+
+    def __init__(self, name, submitted, callback=None, posted=False):
+        self.name = name
+        self.callback = callback
+        self.submitted = submitted
+
+        # A posted completion was not run by a worker (and is not pending)
+        self.posted = posted
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    @property
+    def wait(self):
+        """
+        Time (seconds) the action spent queued before a worker took it
+        """
+        return self.started - self.submitted
+
+    @property
+    def latency(self):
+        """
+        Time (seconds) from hand off to the dispatcher to completion
+        """
+        return self.finished - self.submitted
+
+
+class ActionDispatcher:
+    """
+    The action dispatcher runs actions that might wait on the network
+    (e.g., a grow request to the grpc service) on a bounded pool of workers.
+
+    Completions are put on a queue and a byte is written to a pipe, so
+    an event loop (e.g., the flux reactor) can watch the read end and
+    drain completions back on its own thread. Submit and drain are expected
+    to be called from that same thread.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or defaults.action_workers
+        self.max_pending = max_pending or defaults.action_max_pending
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="ensemble-action"
+        )
+        self.completed = queue.SimpleQueue()
+
+        # Actions submitted and not yet drained
+        self.pending = 0
+        self.rejected = 0
+
+        # The reactor watches the read end to know when to drain
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+
+    @property
+    def depth(self):
+        return self.pending
+
+    def fileno(self):
+        """
+        File descriptor that becomes readable when completions are ready.
+        """
+        return self.read_fd
+
+    def submit(self, name, func, *args, callback=None, **kwargs):
+        """
+        Hand an action to the pool. This never blocks: if the pool is
+        saturated we return False and the caller decides what to do.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+
+        completion = Completion(name, time.time(), callback)
+        self.pending += 1
+        self.executor.submit(self.run, completion, func, *args, **kwargs)
+        return True
+
+    def post(self, name, callback, result=None):
+        """
+        Post a result to be handled on the event loop, from any thread.
+
+        This is for results that did not come from a dispatched action,
+        such as a command the grpc service sent over a stream.
+        """
+        now = time.time()
+        completion = Completion(name, now, callback, posted=True)
+        completion.started = completion.finished = now
+        completion.result = result
+        self.notify(completion)
+
+    def notify(self, completion):
+        """
+        Put a completion on the queue, and wake up the event loop.
+        """
+        self.completed.put(completion)
+
+        # If the pipe is full the reactor is already going to wake up
+        try:
+            os.write(self.write_fd, b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def run(self, completion, func, *args, **kwargs):
+        """
+        Run the action in a worker thread, and post the completion back.
+        """
+        completion.started = time.time()
+        try:
+            completion.result = func(*args, **kwargs)
+        except Exception as err:
+            completion.error = err
+        completion.finished = time.time()
+        self.notify(completion)
+
+    def drain(self):
+        """
+        Run callbacks for finished actions on the calling thread.
+        """
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+        count = 0
+        while True:
+            try:
+                completion = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            if not completion.posted:
+                self.pending -= 1
+            count += 1
+            if completion.callback is not None:
+                completion.callback(completion)
+        return count
+
+    def shutdown(self):
+        """
+        Stop taking actions. Those already running are not waited for.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for fd in [self.read_fd, self.write_fd]:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
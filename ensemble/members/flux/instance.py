@@ -0,0 +1,53 @@
+import sys
+
+try:
+    import flux
+    import flux.constants
+except ImportError:
+    sys.exit("flux python is required to use the flux queue member")
+
+
+class FluxInstance:
+    """
+    A Flux instance the queue member monitors and submits jobs to.
+
+    Each instance has its own handle and job table (job ids are only unique
+    within an instance). With a reactor, the handle uses it instead of its
+    own, so one reactor runs the events of every instance.
+    """
+
+    def __init__(self, uri=None, reactor=None):
+        self.uri = uri
+        self.handle = flux.Flux(uri) if uri else flux.Flux()
+        if reactor is not None:
+            self.handle.set_reactor(reactor)
+
+        # Jobs we submitted that are not cleaned up, by job id
+        self.jobids = {}
+
+        # Jobs in the queue (submitted and not started)
+        self.queued = 0
+
+        # The sentinel tells us when we have finished with the backlog
+        self.seen_sentinel = False
+
+    @property
+    def name(self):
+        return self.uri or "local"
+
+    def subscribe(self, callback):
+        """
+        Stream the events journal, with callback(instance, response).
+        """
+
+        def event_callback(response):
+            callback(self, response)
+
+        events = self.handle.rpc(
+            "job-manager.events-journal",
+            {},
+            flux.constants.FLUX_NODEID_ANY,
+            flags=flux.constants.FLUX_RPC_STREAMING,
+        )
+        events.then(event_callback)
+        return events
@@ -1,4 +1,7 @@
-from ensemble.members.client import EnsembleClient
+import json
+import threading
+
+from ensemble.members.coalesce import ResizeCoalescer
 from ensemble.members.flux.queue import FluxQueue as MemberBase
 
 # These are triggers supported for rules
@@ -25,6 +28,13 @@ class FluxMiniClusterQueue(MemberBase):
         super().__init__(**kwargs)
         self.set_identifier()
 
+        # Grow and shrink requests within a window are merged
+        self.coalescer = ResizeCoalescer()
+
+        # A stream to the service is opened on first use (if enabled)
+        self._stream = None
+        self.stream_lock = threading.Lock()
+
     def set_identifier(self):
         """
         Get the name/namespace of the MiniCluster
@@ -51,12 +61,28 @@ class FluxMiniClusterQueue(MemberBase):
     def client(self):
         """
         Ensure we have a connection to the service client.
+
+        We import here, since grpc is only needed once we talk to the service.
         """
         if hasattr(self, "_client"):
             return self._client
+        from ensemble.members.client import EnsembleClient
+
         self._client = EnsembleClient(host=self.host)
         return self._client
 
+    @property
+    def stream(self):
+        """
+        Ensure we have a live stream to the service, reconnecting if it closed.
+        """
+        with self.stream_lock:
+            if self._stream is None or self._stream.closed:
+                self._stream = self.client.stream(
+                    member=f"{self.name}s", name=self.options["name"], on_command=self.post_command
+                )
+            return self._stream
+
     @property
     def payload(self):
         """
@@ -68,32 +94,150 @@ class FluxMiniClusterQueue(MemberBase):
         """
         Request to the API to grow the MiniCluster
         """
-        name = self.options["name"]
-        payload = self.payload
-
-        # Add the grow value to the payload
-        payload["grow"] = rule.action.value()
-
-        # Member "minicluster" should be plural here
-        response = self.client.action_request(
-            member=f"{self.name}s", name=name, action="grow", payload=payload
-        )
-        print(response)
+        self.resize(int(rule.action.value()))
 
     def shrink(self, rule, record=None):
         """
         Request to the API to shrink the MiniCluster
         """
+        self.resize(-1 * int(rule.action.value()))
+
+    def resize(self, delta):
+        """
+        Add a change in size to the current window, opening one if needed.
+
+        When the window closes, we make one request for the net change in
+        size. A window of 0 means every request is made on its own.
+        """
         name = self.options["name"]
+        window = self.options.get("resize_window") or 0
+        if window <= 0:
+            return self.dispatch_resize(name, delta)
+
+        # The first request of a window schedules the flush
+        if self.coalescer.add(name, delta):
+            watcher = self.handle.timer_watcher_create(window, self.flush_resize)
+            watcher.start()
+
+    def flush_resize(self, handle, watcher, revents, args):
+        """
+        Close the resize window, and request the net change per MiniCluster.
+        """
+        # One shot timer, we create a new one for the next window
+        watcher.destroy()
+        deltas = self.coalescer.flush()
+        if not deltas:
+            print("Resize requests in window cancelled out, no change requested")
+        for name, delta in deltas.items():
+            self.dispatch_resize(name, delta)
+
+    def dispatch_resize(self, name, delta):
+        """
+        Hand a net change in size to the dispatcher to request from the service.
+        """
+        action = "grow" if delta > 0 else "shrink"
+        return self.dispatch(action, self.request_resize, name, action, abs(delta))
+
+    def request_resize(self, name, action, value):
+        """
+        Request to the API to grow or shrink the MiniCluster.
 
-        # Add the grow value to the payload
+        This runs on a dispatcher worker, and not on the reactor.
+        """
         payload = self.payload
-        payload["shrink"] = rule.action.value()
+        payload[action] = value
+        if self.options.get("stream"):
+            try:
+                return self.stream.action_request(action, payload)
+            except ConnectionError as err:
+                print(f"Cannot use the stream ({err}), sending the request on its own")
+
+        # Member "minicluster" should be plural here
+        return self.client.action_request(
+            member=f"{self.name}s", name=name, action=action, payload=payload
+        )
 
-        response = self.client.action_request(
-            member=f"{self.name}s", name=name, action="shrink", payload=payload
+    def status(self):
+        """
+        Ask the service for the status of the MiniCluster.
+
+        This is answered from a cache on the service (and does not ask
+        Kubernetes) so it is cheap to poll, e.g., to check that a grow has
+        landed (pending is 0) before asking for another one.
+        """
+        payload = self.payload
+        response = self.client.status_request(
+            member=f"{self.name}s",
+            name=self.options["name"],
+            group=payload["group"],
+            version=payload["version"],
         )
-        print(response)
+        if response.status != response.ResultType.SUCCESS:
+            return
+        return json.loads(response.payload)
+
+    def record_heartbeat_metrics(self):
+        """
+        On the heartbeat, also send a digest of metrics over the stream.
+        """
+        super().record_heartbeat_metrics()
+        if self.options.get("stream"):
+            self.send_digest()
+
+    def send_digest(self):
+        """
+        Send a digest of current metrics to the service.
+
+        We include queue pressure (pending jobs), which the service can
+        use to decide who gets nodes first when they are scarce.
+        """
+        payload = self.metrics.to_dict()
+        payload["queue"] = {"pending": self.pending_jobs}
+        try:
+            self.stream.send_digest(payload)
+        except ConnectionError as err:
+            print(f"Cannot send metrics digest: {err}")
+
+    def post_command(self, command, payload):
+        """
+        A command from the service arrives on the stream thread, so we
+        post it to be handled on the reactor.
+        """
+        self.dispatcher.post(command, self.on_command, payload)
+
+    def on_command(self, completion):
+        """
+        Handle a command sent by the service (on the reactor).
+        """
+        command = completion.name
+        self.announce(f" <= service {command}", color="blue")
+        if command == "digest":
+            return self.send_digest()
+        if command == "terminate":
+            return self.terminate()
+        if command == "granted":
+            payload = completion.result
+            print(
+                f"Grow by {payload.get('grow')} that was queued is granted, size is {payload.get('size')}"
+            )
+            return
+        print(f"Command {command} from the service is not known, ignoring")
+
+    def terminate(self):
+        """
+        Close the stream to the service (if we have one) and terminate.
+        """
+        if self._stream is not None:
+            self._stream.close()
+        super().terminate()
+
+    def on_action_complete(self, completion):
+        """
+        Show the response from the grpc service (on the reactor)
+        """
+        super().on_action_complete(completion)
+        if completion.result is not None:
+            print(completion.result)
 
     @property
     def name(self):
@@ -1,10 +1,18 @@
-import os
+import collections
 import shlex
+import signal
 import sys
 import time
 
-from ensemble.heartbeat import QueueHeartbeat
+import ensemble.defaults as defaults
+from ensemble.config import sweep
+from ensemble.config.config import group_dependencies
+from ensemble.config.source import JobSource
+from ensemble.config.types import Action, Rule
+from ensemble.heartbeat import Heartbeat, install_signal_handlers
+from ensemble.members.backlog import Backlog
 from ensemble.members.base import MemberBase
+from ensemble.members.flux.instance import FluxInstance
 
 try:
     import flux
@@ -61,6 +69,7 @@ class FluxQueue(MemberBase):
     def __init__(
         self,
         summary_frequency=10,
+        uris=None,
         **kwargs,
     ):
         """
@@ -69,22 +78,40 @@ class FluxQueue(MemberBase):
         Parameters:
         summary_frequency (int): how often (events) to show summary
         to 60 seconds. If you set to 0, it will not be set.
+        uris (list): flux instances to monitor (defaults to the one we are in)
         """
-        self.handle = flux.Flux()
+        # The first instance runs the reactor, and the others share it
+        uris = uris or [None]
+        self.instances = [FluxInstance(uris[0])]
+        reactor = self.instances[0].handle.get_reactor()
+        for uri in uris[1:]:
+            self.instances.append(FluxInstance(uri, reactor))
+        self.handle = self.instances[0].handle
 
         # How often on job completions to summarize?
         self.summary_freqency = summary_frequency
         self.completion_counter = 0
 
-        # The flux sentinel tells us when we have finished with the backlog
-        # https://github.com/flux-framework/flux-core/blob/master/src/modules/job-manager/journal.c#L28-L33
-        self.seen_sentinel = False
-
         # Have we run the start events?
         self.started = False
 
-        # We store the job id associated with a group until it's cleaned up
-        self.jobids = {}
+        # Groups with jobs left to submit, interleaved by weight
+        self.backlog = Backlog(on_done=self.on_group_submitted)
+
+        # Groups waiting for others to be submitted, job ids of groups others
+        # wait for, and their barrier jobs, by (group name, scheme). A group
+        # can have more than one jobs entry, so we count the entries left
+        self.waiting = []
+        self.tracked = {}
+        self.barriers = {}
+        self.submitting = collections.Counter()
+
+        # Jobs per group in the queue (submitted and not started), over instances
+        self.queued = collections.Counter()
+        self.backlog_watcher = None
+
+        # The heartbeat is a timer on our reactor (if the config has one)
+        self.heartbeat = None
         super().__init__(**kwargs)
 
     @property
@@ -97,17 +124,31 @@ class FluxQueue(MemberBase):
     def terminate(self):
         """
         Custom termination function for flux.
+
+        Jobs left in the backlog (or waiting) are closed, so a job source
+        saves the offset of the records we used.
         """
+        self.backlog.close()
+        for _, jobs in self.waiting:
+            jobs.close()
+        self.waiting = []
+        self.submitting.clear()
+        self.dispatcher.shutdown()
+        self.custom_pool.shutdown()
         self.handle.reactor_stop()
 
-    def record_metrics(self, record):
+    def record_metrics(self, record, instance=None):
         """
         Parse a Flux event and record metrics for the group.
+
+        Metrics are by group, so they add up over instances.
         """
+        instance = instance or self.instances[0]
+
         # If we are picking up a queue backlog, we might be missing the id
         # We have to assume we are only interested in the context that is
         # seen by the ensemble runner.
-        if record["id"] not in self.jobids:
+        if record["id"] not in instance.jobids:
             return
 
         # This should only be one after the sentinal, but we will not assume
@@ -119,21 +160,39 @@ class FluxQueue(MemberBase):
 
             # We want to keep the start timestamp for duration
             if event["name"] == "start":
-                self.record_start_metrics(event, record)
+                self.record_start_metrics(event, record, instance)
 
             # We want to keep the submit timestamp for time in queue
             if event["name"] == "submit":
-                self.record_submit_metrics(event, record)
+                self.record_submit_metrics(event, record, instance)
 
             # Job finish
             if event["name"] == "finish":
-                self.record_finish_metrics(event, record)
+                self.record_finish_metrics(event, record, instance)
+
+            # Job cleanup (we only get here if it did not finish)
+            if event["name"] == "clean":
+                self.record_clean_metrics(event, record, instance)
 
         # Once events are recorded, trigger actions associated
         # with metric event updates. This is usually counts, etc.
         for rule in self.iter_rules("metric"):
             self.execute_rule(rule, record)
 
+    @property
+    def pending_jobs(self):
+        """
+        Jobs that were submitted and have not started (queue pressure)
+        """
+        return sum(self.queued.values())
+
+    def iter_jobs(self):
+        """
+        Yield (job id, job) we are tracking, for every instance.
+        """
+        for instance in self.instances:
+            yield from instance.jobids.items()
+
     def record_heartbeat_metrics(self):
         """
         Heartbeat metrics cannot rely on an event, but need
@@ -145,7 +204,7 @@ class FluxQueue(MemberBase):
         are still pending) get counted again, possibly increasing time.
         """
         groups = set()
-        for _, group in self.jobids.items():
+        for _, group in self.iter_jobs():
             groups.add(group["name"])
 
             # If we have a submit but not a start, we haven't included
@@ -156,20 +215,25 @@ class FluxQueue(MemberBase):
                 self.metrics.record_datum(group_name, time_in_queue)
 
         print(f"Found active groups {groups}")
+        if len(self.instances) > 1:
+            for instance in self.instances:
+                print(
+                    f"   {instance.name}: {instance.queued} queued, {len(instance.jobids)} active"
+                )
 
         # Now execute metric rules that might be impacted
         for rule in self.iter_rules("metric"):
             self.execute_rule(rule)
 
-    def record_start_metrics(self, event, record):
+    def record_start_metrics(self, event, record, instance):
         """
         We typically want to keep the job start time for the
         overall job duration, and calculate time in queue (pending)
         """
-        group = self.jobids.get(record["id"])
+        group = instance.jobids.get(record["id"])
 
         # We are interested in time in the queue
-        self.jobids[record["id"]]["start"] = event["timestamp"]
+        instance.jobids[record["id"]]["start"] = event["timestamp"]
 
         # Time in the queue is the start time (larger) - submit time
         time_in_queue = event["timestamp"] - group["submit"]
@@ -177,20 +241,32 @@ class FluxQueue(MemberBase):
         # Pending time is time in the queue
         group_name = f"{group['name']}-pending"
         self.metrics.record_datum(group_name, time_in_queue)
+        self.job_left_queue(group, instance)
 
-    def record_submit_metrics(self, event, record):
+    def record_clean_metrics(self, event, record, instance):
+        """
+        A job cleaned up without starting (e.g., it was cancelled) has no
+        finish event, so we stop tracking it here.
+        """
+        group = instance.jobids.get(record["id"])
+        if group is None or "start" in group:
+            return
+        del instance.jobids[record["id"]]
+        self.job_left_queue(group, instance)
+
+    def record_submit_metrics(self, event, record, instance):
         """
         We typically want to keep the job submit time to calculate
         time in the queue, which is the start timestamp - submit ts.
         """
-        self.jobids[record["id"]]["submit"] = event["timestamp"]
+        instance.jobids[record["id"]]["submit"] = event["timestamp"]
 
-    def record_finish_metrics(self, event, record):
+    def record_finish_metrics(self, event, record, instance):
         """
         Record metrics at the finish of jobs, typically duration
         and breaking apart by success / failure vs. just completed
         """
-        group = self.jobids.get(record["id"])
+        group = instance.jobids.get(record["id"])
 
         # We are interested in duration
         duration = event["timestamp"] - group["start"]
@@ -200,7 +276,7 @@ class FluxQueue(MemberBase):
         self.metrics.record_datum(group_name, duration)
 
         # Clean up the job from history here, we are done
-        del self.jobids[record["id"]]
+        del instance.jobids[record["id"]]
 
         # Increment finished jobs by one
         self.metrics.increment(group["name"], "finished")
@@ -222,19 +298,22 @@ class FluxQueue(MemberBase):
                 self.metrics.summarize_all()
             self.completion_counter = 0
 
-    def record_event(self, record):
+    def record_event(self, record, instance=None):
         """
         Record the event. This needs to be specific to the workload manager.
         """
+        instance = instance or self.instances[0]
+
         # The sentinel tells us when the "backlog" is finished
+        # https://github.com/flux-framework/flux-core/blob/master/src/modules/job-manager/journal.c#L28-L33
         if record["id"] == -1:
             if self.cfg.debug_logging:
-                print("Sentinel is seen, starting event monitoring.")
-            self.seen_sentinel = True
+                print(f"Sentinel is seen for {instance.name}, starting event monitoring.")
+            instance.seen_sentinel = True
             return
 
         # Record metrics for the event
-        self.record_metrics(record)
+        self.record_metrics(record, instance)
 
         # Check to see if the ensemble has any triggers for the event
         # Unlike metrics (automated) these are event triggers from
@@ -275,7 +354,7 @@ class FluxQueue(MemberBase):
         https://github.com/flux-framework/flux-core/blob/master/src/modules/job-manager/journal.c#L11-L41
         """
 
-        def event_callback(response):
+        def event_callback(instance, response):
             """
             Receive callback when a flux job posts an event.
             """
@@ -288,45 +367,48 @@ class FluxQueue(MemberBase):
             if self.cfg.debug_logging:
                 print(payload)
             response.reset()
-            self.record_event(payload)
-
-        events = self.handle.rpc(
-            "job-manager.events-journal",
-            {},
-            flux.constants.FLUX_NODEID_ANY,
-            flags=flux.constants.FLUX_RPC_STREAMING,
-        )
-        events.then(event_callback)
-        self.setup_flux_heartbeat()
+            self.record_event(payload, instance)
+
+        # With more than one instance, events of all of them come to our reactor
+        for instance in self.instances:
+            instance.subscribe(event_callback)
+        self.setup_dispatcher()
+        self.setup_heartbeat()
+        self.setup_config_watch()
+        install_signal_handlers()
         self.reactor_start()
 
-    def setup_flux_heartbeat(self):
+    def setup_dispatcher(self):
         """
-        Start the heartbeat via a flux watcher.
+        Watch the action dispatcher, so completed actions are handled on the reactor.
         """
-        # Exit early if we aren't using a heartbeat
-        if not self.cfg.heartbeat:
-            return
 
-        # Customize the heartbeat duration by reloading the module
-        # We call to system flux since python can error
-        assert os.system("flux module remove heartbeat") == 0
-        assert os.system(f"flux module load heartbeat period={self.cfg.heartbeat}s") == 0
+        def dispatch_callback(handle, watcher, fd, revents, args):
+            self.dispatcher.drain()
+
+        watcher = self.handle.fd_watcher_create(
+            self.dispatcher.fileno(), dispatch_callback, events=flux.constants.FLUX_POLLIN
+        )
+        watcher.start()
+
+    def setup_config_watch(self):
+        """
+        Reload the config on SIGHUP, and when the file changes (with watch).
+        """
 
-        def heartbeat_callback(handle, msg_handler, msg, arg):
-            print("💗 HEARTBEAT")
-            self.summarize()
-            self.record_heartbeat_metrics()
+        def reload_callback(handle, watcher, signum, args):
+            self.reload()
 
-        self.handle.event_subscribe("heartbeat.pulse")
+        def watch_callback(handle, watcher, revents, args):
+            if self.config_changed():
+                self.reload()
 
-        #  Create a message handler for the heartbeat.pulse event messages
-        watcher = self.handle.msg_watcher_create(
-            heartbeat_callback, flux.constants.FLUX_MSGTYPE_EVENT, "heartbeat.pulse"
-        )
-        # This relies on self.handle.reactor_start()
-        # this is called in the parent function, once.
+        watcher = self.handle.signal_watcher_create(signal.SIGHUP, reload_callback)
         watcher.start()
+        if self.options.get("watch"):
+            seconds = defaults.config_watch_seconds
+            watcher = self.handle.timer_watcher_create(seconds, watch_callback, repeat=seconds)
+            watcher.start()
 
     def reactor_start(self):
         """
@@ -338,27 +420,56 @@ class FluxQueue(MemberBase):
         except KeyboardInterrupt:
             self.terminate()
 
+    def schedule(self, seconds, func):
+        """
+        Run func once after some seconds, on the reactor.
+
+        Returns a function to cancel it.
+        """
+
+        def timer_callback(handle, watcher, revents, args):
+            watcher.destroy()
+            func()
+
+        watcher = self.handle.timer_watcher_create(seconds, timer_callback)
+        watcher.start()
+        return watcher.destroy
+
     def setup_heartbeat(self):
         """
-        Setup the heartbeat - a threading.Thread
+        Setup the heartbeat, a timer on the reactor of our handle.
+
+        This is private to us (the flux heartbeat module is left alone), and
+        is started again if a reload changes the interval.
         """
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
+            self.heartbeat = None
         if not self.cfg.heartbeat:
             return
-
-        def heartbeat_callback(cls):
-            print("💗 HEARTBEAT")
-            self.summarize()
-            self.record_heartbeat_metrics()
-
-        # Instead we are using threading, which works!
-        self.heartbeat = QueueHeartbeat(self.cfg.heartbeat, heartbeat_callback, cls=self)
+        self.heartbeat = Heartbeat(self.cfg.heartbeat, self.on_heartbeat, self.schedule)
         self.heartbeat.start()
 
+    def on_heartbeat(self, heartbeat):
+        """
+        Run on each heartbeat, and record how late it was.
+        """
+        print("💗 HEARTBEAT")
+        self.metrics.record_datum("heartbeat-lateness", heartbeat.lateness)
+        if heartbeat.missed:
+            print(f"   skipped {heartbeat.missed} heartbeats (total {heartbeat.skipped})")
+        self.summarize()
+        self.record_heartbeat_metrics()
+
     def custom(self, rule, record=None):
         """
         Custom runs a custom action (and runs another action, if returned)
         and passes forward the flux handle and other metadata.
+
+        If the action sets a pool, it runs there instead (see custom_pooled).
         """
+        if rule.action.pool:
+            return self.custom_pooled(rule, record)
         kwargs = {
             "event": record,
             "action": rule.action,
@@ -367,65 +478,380 @@ class FluxQueue(MemberBase):
             "metrics": self.metrics,
         }
         action = rule.action.func(**kwargs)
-        if action is not None:
-            return self.execute_action(rule, record)
+        return self.follow_up(rule, action, record)
+
+    def custom_pooled(self, rule, record=None):
+        """
+        Run a custom action in a thread or process pool, so it cannot
+        block the reactor.
+
+        The function gets copies of the event, rule, and action, and a
+        snapshot of metrics (as a dict). There is no flux handle, since
+        it cannot be used off the reactor. A follow up action comes back
+        to the reactor to run. With a timeout, we stop waiting and ignore
+        the result after that many seconds.
+        """
+        action = rule.action
+        if self.custom_pool.count(rule) >= action.concurrency:
+            print(f"Custom action {action.label} skipped, {action.concurrency} already running")
+            return
+        kwargs = {
+            "event": record,
+            "action": dict(action._action),
+            "rule": dict(rule._rule),
+            "handle": None,
+            "metrics": self.metrics.to_dict(),
+        }
+        task = self.custom_pool.submit(
+            rule, self.cfg.custom_loader.source, kwargs, self.on_custom_complete, record
+        )
+        if action.timeout:
+            task.timer = self.handle.timer_watcher_create(
+                action.timeout, self.on_custom_timeout, args=task
+            )
+            task.timer.start()
+
+    def on_custom_complete(self, completion):
+        """
+        Handle the result of a custom action from the pool, on the reactor.
+        """
+        task = completion.result
+        label = task.rule.action.label
+        self.custom_pool.release(task)
+        if task.timed_out:
+            if not task.future.cancelled():
+                print(f"Custom action {label} finished after its timeout, result ignored")
+            return
+        if task.timer is not None:
+            task.timer.destroy()
+        self.metrics.record_datum(f"custom-{label}-latency", time.time() - task.submitted)
+        try:
+            action = task.future.result()
+        except Exception as err:
+            print(f"Custom action {label} failed: {err}")
+            return
+        return self.follow_up(task.rule, action, task.record)
+
+    def on_custom_timeout(self, handle, watcher, revents, task):
+        """
+        A custom action in a pool did not finish in time.
+        """
+        watcher.destroy()
+        task.timer = None
+        if task.future.done():
+            return
+
+        # If it has not started we can cancel it, otherwise we ignore its
+        # result. It is released (see release) when the future is done.
+        task.future.cancel()
+        task.timed_out = True
+        self.metrics.increment(task.rule.action.label, "custom-timeout")
+        print(f"Custom action {task.rule.action.label} timed out after {task.rule.action.timeout}s")
+
+    def follow_up(self, rule, action, record=None):
+        """
+        Run the action a custom function returned (an Action or dict), if any.
+        """
+        if action is None:
+            return
+        if isinstance(action, Action):
+            action = action._action
+        try:
+            followup = Rule(
+                {"trigger": rule.trigger, "name": rule.name, "action": action}, self.cfg.custom
+            )
+        except ValueError as err:
+            print(f"Custom action {rule.action.label} returned an invalid action: {err}")
+            return
+        return self.execute_action(followup, record)
 
     def submit(self, rule, record=None):
         """
         Receive the flux handle and StatusRequest payload to act on.
+
+        Jobs are generated as they are submitted, and added to a backlog
+        that is submitted in chunks, so a large group (or sweep) does
+        not block the reactor or need memory for every job.
         """
         action = rule.action
 
         # Dp we want to target a specific job label?
-        # Now submit, likely randomized
         for group in self.cfg.iter_jobs(action.label):
-            jobset = self.extract_jobs(group)
+            self.add_group(group)
+        self.submit_backlog()
+
+    def add_group(self, group):
+        """
+        Add a group to the backlog, or to wait for the groups it depends on.
+        """
+        name = group["name"]
+        self.submitting[name] += 1
 
-            for job in jobset:
-                # If the number of tasks < node count we get an error
-                # assume the user wants one task per node
-                if job["tasks"] < job["nodes"]:
-                    job["tasks"] = job["nodes"]
+        # Groups that wait for this one now wait for this submission
+        for key in self.cfg.upstream:
+            if key[0] == name:
+                self.barriers.pop(key, None)
+                self.tracked.setdefault(key, [])
 
-                jobspec = flux.job.JobspecV1.from_command(
-                    command=job["command"], num_nodes=job["nodes"], num_tasks=job["tasks"]
+        jobs = self.extract_jobs(group)
+        if not group_dependencies(group):
+            return self.backlog.add(group, jobs)
+        self.waiting.append((group, jobs))
+        self.release_waiting()
+        if any(waiting is group for waiting, _ in self.waiting):
+            print(f"Job group {name} waits for the groups it depends on to be submitted")
+
+    def release_waiting(self):
+        """
+        Add waiting groups to the backlog once the groups they wait for
+        are submitted. Their jobs depend on the barrier jobs of those groups,
+        so flux starts them when the barriers finish (with success).
+        """
+        waiting = []
+        for group, jobs in self.waiting:
+            dependencies = group_dependencies(group)
+            if any(key not in self.barriers for key in dependencies):
+                waiting.append((group, jobs))
+                continue
+            values = [{"scheme": "afterok", "value": self.barriers[key]} for key in dependencies]
+            self.backlog.add(group, self.with_dependencies(jobs, values))
+        self.waiting = waiting
+
+    def with_dependencies(self, jobs, dependencies):
+        """
+        Add flux job dependencies to jobs.
+        """
+        try:
+            for job in jobs:
+                job["dependencies"] = dependencies
+                yield job
+        finally:
+            jobs.close()
+
+    def on_group_submitted(self, group):
+        """
+        All jobs of a group entry were submitted. Once every entry of the
+        group is, we can submit the barriers other groups wait for, and
+        release them.
+        """
+        self.submitting[group["name"]] -= 1
+        if self.submitting[group["name"]] > 0:
+            return
+        del self.submitting[group["name"]]
+        for scheme in ["afterany", "afterok"]:
+            key = (group["name"], scheme)
+            if key in self.tracked:
+                self.barriers[key] = self.submit_barrier(
+                    group["name"], scheme, self.tracked.pop(key)
                 )
-                workdir = job["workdir"]
+        if self.waiting:
+            self.release_waiting()
+
+    def submit_barrier(self, name, scheme, jobids):
+        """
+        Submit a barrier job, which does nothing once jobids are done.
+
+        A barrier depends on every job of a group (with afterany or afterok),
+        so a group that waits for it only needs one dependency. It asks for
+        one core (not a node), so it does not hold a node while it runs.
+        Returns the job id (as the string flux dependencies use).
+        """
+        jobspec = flux.job.JobspecV1.from_command(command=["true"], num_tasks=1)
+        jobspec.attributes["user"] = {"group": f"{name}-barrier"}
+        jobspec.setattr(
+            "system.dependencies", [{"scheme": scheme, "value": jobid} for jobid in jobids]
+        )
+        jobid = flux.job.submit(self.handle, jobspec)
+        return str(jobid.as_integer_ratio()[0])
+
+    def track_job(self, name, jobid):
+        """
+        Keep the job id of a group that others wait for. At fan in, we
+        submit a barrier for the ids so far and keep that instead, so we
+        hold (and a barrier waits for) a bounded number of ids.
+        """
+        for scheme in ["afterany", "afterok"]:
+            jobids = self.tracked.get((name, scheme))
+            if jobids is None:
+                continue
+            jobids.append(str(jobid))
+            if len(jobids) >= defaults.barrier_fan_in:
+                self.tracked[(name, scheme)] = [self.submit_barrier(name, scheme, jobids)]
 
-                # Set user attribute we can later retrieve to identify group
-                jobspec.attributes["user"] = {"group": group["name"]}
+    def submit_backlog(self, handle=None, watcher=None, revents=None, args=None):
+        """
+        Submit a chunk of jobs from the backlog.
 
-                # Do we have a working directory?
-                if workdir:
-                    jobspec.cwd = workdir
+        Groups take turns by weight (see Backlog). A group with a depth
+        only has that many jobs in the queue (submitted and not started)
+        at once, and is topped up as its jobs start. If jobs are left for
+        groups with room, we schedule the next chunk with a timer, so the
+        reactor handles events in between.
+        """
+        if watcher is not None:
+            watcher.destroy()
+            self.backlog_watcher = None
 
-                # Use direction or default to 0, unlimited
-                jobspec.duration = job["duration"]
-                jobid = flux.job.submit(self.handle, jobspec)
+        budget = defaults.submit_chunk_size
+        for group, job in self.backlog.take(budget, self.has_room):
+            self.submit_job(group, job)
+            budget -= 1
+
+        if budget == 0 and self.backlog and self.backlog_watcher is None:
+            self.backlog_watcher = self.handle.timer_watcher_create(0, self.submit_backlog)
+            self.backlog_watcher.start()
+
+    def has_room(self, group):
+        """
+        Determine if a group is under its target queue depth (if it has one).
+        """
+        depth = group.get("depth")
+        return not depth or self.queued[group["name"]] < depth
+
+    def job_left_queue(self, group, instance):
+        """
+        A job for a group started (or was cleaned up before it started).
+        """
+        instance.queued -= 1
+        self.queued[group["name"]] -= 1
+        if self.backlog and group.get("depth") is not None:
+            self.submit_backlog()
+
+    def submit_job(self, group, job):
+        """
+        Submit one job for a group to flux.
+        """
+        # If the number of tasks < node count we get an error
+        # assume the user wants one task per node
+        if job["tasks"] < job["nodes"]:
+            job["tasks"] = job["nodes"]
+
+        jobspec = flux.job.JobspecV1.from_command(
+            command=job["command"], num_nodes=job["nodes"], num_tasks=job["tasks"]
+        )
+        workdir = job["workdir"]
 
-                # Don't rely on an event here, this is when the user (us) submits
-                submit_time = time.time()
+        # Set user attribute we can later retrieve to identify group
+        jobspec.attributes["user"] = {"group": group["name"]}
 
-                # This is the job id that will show up in events
-                numerical = jobid.as_integer_ratio()[0]
-                self.jobids[numerical] = {"name": group["name"], "submit-timestamp": submit_time}
+        # Do we have a working directory?
+        if workdir:
+            jobspec.cwd = workdir
+
+        # Use direction or default to 0, unlimited
+        jobspec.duration = job["duration"]
+
+        # Jobs of a group that waits for others depend on their barriers
+        if job.get("dependencies"):
+            jobspec.setattr("system.dependencies", job["dependencies"])
+        instance = self.route(group)
+        jobid = flux.job.submit(instance.handle, jobspec)
+
+        # Don't rely on an event here, this is when the user (us) submits
+        submit_time = time.time()
+
+        # This is the job id that will show up in events
+        numerical = jobid.as_integer_ratio()[0]
+        instance.jobids[numerical] = {
+            "name": group["name"],
+            "submit-timestamp": submit_time,
+            "depth": group.get("depth"),
+        }
+        instance.queued += 1
+        self.queued[group["name"]] += 1
+        if self.tracked:
+            self.track_job(group["name"], numerical)
+
+    def route(self, group):
+        """
+        Choose the instance to submit a job to, the one with the fewest
+        jobs in its queue.
+
+        Flux dependencies are within one instance, so groups that wait for
+        others (or that others wait for) are submitted to the first instance,
+        where we submit barriers.
+        """
+        if len(self.instances) == 1:
+            return self.instances[0]
+        name = group["name"]
+        if group_dependencies(group) or any(key[0] == name for key in self.cfg.upstream):
+            return self.instances[0]
+        return min(self.instances, key=lambda instance: instance.queued)
 
     def extract_jobs(self, group):
         """
-        Given the payload, extract and order jobs
-        """
-        jobs = []
-        tasks = group.get("tasks") or 1
-        nodes = group.get("nodes") or 1
-
-        for _ in range(group.get("count", 1)):
-            jobs.append(
-                {
-                    "command": shlex.split(group["command"]),
-                    "workdir": group.get("workdir"),
-                    "nodes": nodes,
-                    "duration": group.get("duration") or 0,
-                    "tasks": tasks,
-                }
+        Given the payload, yield jobs in order.
+
+        A group with a matrix yields count jobs for each point, with the
+        command rendered for the point. A group with a source yields count
+        jobs for each record in the file, and a record can set the command
+        (or parameters for the group command) and resources. The command of
+        any other group is used as is (so it can have braces).
+        """
+        if group.get("source"):
+            source = JobSource(
+                group["source"],
+                group["name"],
+                group.get("format"),
+                resume=group.get("resume", True),
             )
-        return jobs
+            records = iter(source)
+        elif group.get("matrix"):
+            source = None
+            records = ((point, None) for point in sweep.iter_points(group["matrix"]))
+        else:
+            source = None
+            records = [({}, None)]
+
+        # Only a matrix point or source record is rendered into the command
+        render = source is not None or bool(group.get("matrix"))
+
+        # A record whose last job was taken, so it is used if we stop there
+        taken = None
+        try:
+            for record, offset in records:
+                command = self.get_command(group, record, render)
+                if command is not None:
+                    job = {
+                        "workdir": record.get("workdir") or group.get("workdir"),
+                        "nodes": int(record.get("nodes") or group.get("nodes") or 1),
+                        "duration": float(record.get("duration") or group.get("duration") or 0),
+                        "tasks": int(record.get("tasks") or group.get("tasks") or 1),
+                    }
+                    count = int(record.get("count") or group.get("count", 1))
+                    for i in range(count):
+                        if i == count - 1:
+                            taken = offset
+                        yield {"command": list(command), **job}
+
+                # We get here when the last job for the record was submitted
+                taken = None
+                if source is not None:
+                    source.commit(offset)
+
+        # If we stop early, the source saves the offset it got to
+        finally:
+            if source is not None:
+                if taken is not None:
+                    source.commit(taken)
+                records.close()
+
+    def get_command(self, group, record, render=True):
+        """
+        Get the command (as a list) for a record of a group, or None to skip it.
+
+        A record that cannot be rendered is skipped, since we are on the reactor.
+        """
+        if not render:
+            return shlex.split(group["command"])
+        command = record.get("command")
+        if command is None and not group.get("command"):
+            print(f"Skipping a job of group {group['name']}, it has no command")
+            return
+        if command is None:
+            try:
+                command = sweep.render(group["command"], record)
+            except (KeyError, IndexError, ValueError) as err:
+                print(f"Skipping a job of group {group['name']}, cannot render command: {err!r}")
+                return
+        return shlex.split(command)
@@ -1,17 +1,25 @@
-from river import stats
-
 import ensemble.utils as utils
 
+# river (and numpy under it) is slow to import, so models are created on first use
 model_inits = {
-    "variance": stats.Var,
-    "mean": stats.Mean,
-    "iqr": stats.IQR,
-    "max": stats.Max,
-    "min": stats.Min,
-    "mad": stats.MAD,
+    "variance": "Var",
+    "mean": "Mean",
+    "iqr": "IQR",
+    "max": "Max",
+    "min": "Min",
+    "mad": "MAD",
 }
 
 
+def create_model(name):
+    """
+    Create a river stats model by class name (e.g., Mean).
+    """
+    from river import stats
+
+    return getattr(stats, name)()
+
+
 class QueueMetrics:
     """
     QueueMetrics store high level metrics
@@ -52,6 +60,21 @@ class QueueMetrics:
         print(utils.pretty_print_list(items))
         return items
 
+    def to_dict(self):
+        """
+        Return current values of all models, e.g., to send in a digest.
+        """
+        result = {}
+        for model_name, models in self.models.items():
+            if model_name == "count":
+                result[model_name] = {
+                    group: {key: model.get() for key, model in counts.items()}
+                    for group, counts in models.items()
+                }
+                continue
+            result[model_name] = {key: model.get() for key, model in models.items()}
+        return result
+
     def increment(self, group, key):
         """
         Increment the count of a metric.
@@ -62,7 +85,7 @@ class QueueMetrics:
         if group not in self.models["count"]:
             self.models["count"][group] = {}
         if key not in self.models["count"][group]:
-            self.models["count"][group][key] = stats.Count()
+            self.models["count"][group][key] = create_model("Count")
         self.models["count"][group][key].update()
 
     def record_datum(self, key, value, model_name=None):
@@ -80,5 +103,5 @@ class QueueMetrics:
 
         for model_name in model_names:
             if key not in self.models[model_name]:
-                self.models[model_name][key] = model_inits[model_name]()
+                self.models[model_name][key] = create_model(model_inits[model_name])
             self.models[model_name][key].update(value)
@@ -1,4 +1,98 @@
+import bisect
+import contextlib
 import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets (seconds), from half a millisecond to about a minute
+latency_buckets = [0.0005 * 2**i for i in range(18)]
+
+
+class ShardedCounters:
+    """
+    Counters and latency histograms for the server.
+
+    Each thread writes to its own shard, so recording a request never waits
+    on a lock (the lock is only taken the first time a thread records).
+    Reading sums over the shards. A gauge is a counter that goes up and
+    down, and the sum is right even if it goes up and down on different
+    threads.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets or latency_buckets
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+
+    @property
+    def shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = {"counters": {}, "histograms": {}}
+            self.local.shard = shard
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def increment(self, name, value=1):
+        counters = self.shard["counters"]
+        counters[name] = counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """
+        Record a latency (seconds) in a histogram.
+        """
+        histograms = self.shard["histograms"]
+        histogram = histograms.get(name)
+        if histogram is None:
+            # One count per bucket, one for larger, then the count and sum
+            histogram = [0] * (len(self.buckets) + 3)
+            histograms[name] = histogram
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+    def snapshot(self):
+        """
+        Sum the shards into counters and histogram summaries.
+        """
+        with self.lock:
+            shards = list(self.shards)
+
+        counters = {}
+        histograms = {}
+        for shard in shards:
+            for name, value in shard["counters"].copy().items():
+                counters[name] = counters.get(name, 0) + value
+            for name, histogram in shard["histograms"].copy().items():
+                total = histograms.setdefault(name, [0] * len(histogram))
+                for i, value in enumerate(list(histogram)):
+                    total[i] += value
+        return {
+            "counters": counters,
+            "histograms": {name: self.summarize(h) for name, h in histograms.items()},
+        }
+
+    def summarize(self, histogram):
+        """
+        Summarize a histogram with count, mean, and percentiles.
+
+        Percentiles are the upper bound of the bucket they fall in.
+        """
+        count = histogram[-2]
+        summary = {"count": count, "mean": histogram[-1] / count if count else 0}
+        for name, quantile in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]:
+            seen = 0
+            summary[name] = None
+            for i, value in enumerate(histogram[:-2]):
+                seen += value
+                if count and seen >= quantile * count:
+                    summary[name] = self.buckets[i] if i < len(self.buckets) else float("inf")
+                    break
+        return summary
 
 
 class Metrics:
@@ -9,6 +103,7 @@ class Metrics:
     def __init__(self):
         self.start_time = datetime.datetime.now(datetime.timezone.utc)
         self.last_updated = self.start_time
+        self.requests = ShardedCounters()
 
     def tick(self):
         """
@@ -23,12 +118,51 @@ class Metrics:
         """
         return (self.last_updated - self.start_time).seconds
 
+    @contextlib.contextmanager
+    def timed(self, name):
+        """
+        Time a block of code (e.g., a call to the Kubernetes API), counting errors.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.requests.increment(f"{name}:errors")
+            raise
+        finally:
+            self.requests.observe(name, time.perf_counter() - start)
+
     def to_dict(self):
         """
-        Return times as json
+        Return times (and request metrics) as json
         """
         return {
             "start_time": str(self.start_time),
             "last_updated": str(self.last_updated),
             "elapsed": str(self.elapsed),
+            "requests": self.requests.snapshot(),
         }
+
+
+def serve_metrics(metrics, port, host="localhost"):
+    """
+    Serve metrics as json over http (in a background thread).
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(metrics.to_dict()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"📈️ Serving metrics at http://{host}:{port}")
+    return server
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x65nsemble-service.proto\x12\x1e\x63onvergedcomputing.org.grpc.v1\"-\n\rStatusRequest\x12\x0e\n\x06member\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\"N\n\rActionRequest\x12\x0e\n\x06member\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06\x61\x63tion\x18\x03 \x01(\t\x12\x0f\n\x07payload\x18\x04 \x01(\t\"\xaf\x01\n\x08Response\x12\x0f\n\x07payload\x18\x01 \x01(\t\x12\x43\n\x06status\x18\x04 \x01(\x0e\x32\x33.convergedcomputing.org.grpc.v1.Response.ResultType\"M\n\nResultType\x12\x0f\n\x0bUNSPECIFIED\x10\x00\x12\x0b\n\x07SUCCESS\x10\x01\x12\t\n\x05\x45RROR\x10\x02\x12\n\n\x06\x44\x45NIED\x10\x03\x12\n\n\x06\x45XISTS\x10\x04\x32\xe6\x01\n\x10\x45nsembleOperator\x12h\n\rRequestStatus\x12-.convergedcomputing.org.grpc.v1.StatusRequest\x1a(.convergedcomputing.org.grpc.v1.Response\x12h\n\rRequestAction\x12-.convergedcomputing.org.grpc.v1.ActionRequest\x1a(.convergedcomputing.org.grpc.v1.ResponseB7Z5github.com/converged-computing/ensemble-python/protosb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16\x65nsemble-service.proto\x12\x1e\x63onvergedcomputing.org.grpc.v1\"m\n\rStatusRequest\x12\x0e\n\x06member\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12>\n\x07payload\x18\x03 \x01(\x0b\x32-.convergedcomputing.org.grpc.v1.StatusPayload\"/\n\rStatusPayload\x12\r\n\x05group\x18\x01 \x01(\t\x12\x0f\n\x07version\x18\x02 \x01(\t\"W\n\rResizePayload\x12\r\n\x05group\x18\x01 \x01(\t\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\r\n\x05\x64\x65lta\x18\x03 \x01(\x05\x12\x17\n\x0fidempotency_key\x18\x04 \x01(\t\"\x99\x01\n\rActionRequest\x12\x0e\n\x06member\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x0e\n\x06\x61\x63tion\x18\x03 \x01(\t\x12\x11\n\x07payload\x18\x04 \x01(\tH\x00\x12?\n\x06resize\x18\x05 \x01(\x0b\x32-.convergedcomputing.org.grpc.v1.ResizePayloadH\x00\x42\x06\n\x04\x62ody\"2\n\x0cMetricDigest\x12\x0f\n\x07payload\x18\x01 \x01(\t\x12\x11\n\ttimestamp\x18\x02 \x01(\x01\"\xcb\x01\n\rMemberMessage\x12\x0e\n\x06member\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x10\n\x08sequence\x18\x03 \x01(\x03\x12?\n\x06\x61\x63tion\x18\x04 \x01(\x0b\x32-.convergedcomputing.org.grpc.v1.ActionRequestH\x00\x12>\n\x06\x64igest\x18\x05 \x01(\x0b\x32,.convergedcomputing.org.grpc.v1.MetricDigestH\x00\x42\t\n\x07message\"\x80\x01\n\x0eServiceMessage\x12\x10\n\x08sequence\x18\x01 \x01(\x03\x12:\n\x08response\x18\x02 \x01(\x0b\x32(.convergedcomputing.org.grpc.v1.Response\x12\x0f\n\x07\x63ommand\x18\x03 \x01(\t\x12\x0f\n\x07payload\x18\x04 \x01(\t\"\xc4\x01\n\x08Response\x12\x0f\n\x07payload\x18\x01 \x01(\t\x12\x43\n\x06status\x18\x04 \x01(\x0e\x32\x33.convergedcomputing.org.grpc.v1.Response.ResultType\x12\x13\n\x0bretry_after\x18\x05 \x01(\x01\"M\n\nResultType\x12\x0f\n\x0bUNSPECIFIED\x10\x00\x12\x0b\n\x07SUCCESS\x10\x01\x12\t\n\x05\x45RROR\x10\x02\x12\n\n\x06\x44\x45NIED\x10\x03\x12\n\n\x06\x45XISTS\x10\x04\x32\xd3\x02\n\x10\x45nsembleOperator\x12h\n\rRequestStatus\x12-.convergedcomputing.org.grpc.v1.StatusRequest\x1a(.convergedcomputing.org.grpc.v1.Response\x12h\n\rRequestAction\x12-.convergedcomputing.org.grpc.v1.ActionRequest\x1a(.convergedcomputing.org.grpc.v1.Response\x12k\n\x06Stream\x12-.convergedcomputing.org.grpc.v1.MemberMessage\x1a..convergedcomputing.org.grpc.v1.ServiceMessage(\x01\x30\x01\x42\x37Z5github.com/converged-computing/ensemble-python/protosb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,13 +33,23 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['DESCRIPTOR']._loaded_options = None
   _globals['DESCRIPTOR']._serialized_options = b'Z5github.com/converged-computing/ensemble-python/protos'
   _globals['_STATUSREQUEST']._serialized_start=58
-  _globals['_STATUSREQUEST']._serialized_end=103
-  _globals['_ACTIONREQUEST']._serialized_start=105
-  _globals['_ACTIONREQUEST']._serialized_end=183
-  _globals['_RESPONSE']._serialized_start=186
-  _globals['_RESPONSE']._serialized_end=361
-  _globals['_RESPONSE_RESULTTYPE']._serialized_start=284
-  _globals['_RESPONSE_RESULTTYPE']._serialized_end=361
-  _globals['_ENSEMBLEOPERATOR']._serialized_start=364
-  _globals['_ENSEMBLEOPERATOR']._serialized_end=594
+  _globals['_STATUSREQUEST']._serialized_end=167
+  _globals['_STATUSPAYLOAD']._serialized_start=169
+  _globals['_STATUSPAYLOAD']._serialized_end=216
+  _globals['_RESIZEPAYLOAD']._serialized_start=218
+  _globals['_RESIZEPAYLOAD']._serialized_end=305
+  _globals['_ACTIONREQUEST']._serialized_start=308
+  _globals['_ACTIONREQUEST']._serialized_end=461
+  _globals['_METRICDIGEST']._serialized_start=463
+  _globals['_METRICDIGEST']._serialized_end=513
+  _globals['_MEMBERMESSAGE']._serialized_start=516
+  _globals['_MEMBERMESSAGE']._serialized_end=719
+  _globals['_SERVICEMESSAGE']._serialized_start=722
+  _globals['_SERVICEMESSAGE']._serialized_end=850
+  _globals['_RESPONSE']._serialized_start=853
+  _globals['_RESPONSE']._serialized_end=1049
+  _globals['_RESPONSE_RESULTTYPE']._serialized_start=972
+  _globals['_RESPONSE_RESULTTYPE']._serialized_end=1049
+  _globals['_ENSEMBLEOPERATOR']._serialized_start=1052
+  _globals['_ENSEMBLEOPERATOR']._serialized_end=1391
 # @@protoc_insertion_point(module_scope)
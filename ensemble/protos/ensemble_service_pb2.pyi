@@ -1,32 +1,90 @@
 from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
-from typing import ClassVar as _ClassVar, Optional as _Optional, Union as _Union
+from typing import ClassVar as _ClassVar, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
 class StatusRequest(_message.Message):
-    __slots__ = ("member", "name")
+    __slots__ = ("member", "name", "payload")
     MEMBER_FIELD_NUMBER: _ClassVar[int]
     NAME_FIELD_NUMBER: _ClassVar[int]
+    PAYLOAD_FIELD_NUMBER: _ClassVar[int]
     member: str
     name: str
-    def __init__(self, member: _Optional[str] = ..., name: _Optional[str] = ...) -> None: ...
+    payload: StatusPayload
+    def __init__(self, member: _Optional[str] = ..., name: _Optional[str] = ..., payload: _Optional[_Union[StatusPayload, _Mapping]] = ...) -> None: ...
+
+class StatusPayload(_message.Message):
+    __slots__ = ("group", "version")
+    GROUP_FIELD_NUMBER: _ClassVar[int]
+    VERSION_FIELD_NUMBER: _ClassVar[int]
+    group: str
+    version: str
+    def __init__(self, group: _Optional[str] = ..., version: _Optional[str] = ...) -> None: ...
+
+class ResizePayload(_message.Message):
+    __slots__ = ("group", "version", "delta", "idempotency_key")
+    GROUP_FIELD_NUMBER: _ClassVar[int]
+    VERSION_FIELD_NUMBER: _ClassVar[int]
+    DELTA_FIELD_NUMBER: _ClassVar[int]
+    IDEMPOTENCY_KEY_FIELD_NUMBER: _ClassVar[int]
+    group: str
+    version: str
+    delta: int
+    idempotency_key: str
+    def __init__(self, group: _Optional[str] = ..., version: _Optional[str] = ..., delta: _Optional[int] = ..., idempotency_key: _Optional[str] = ...) -> None: ...
 
 class ActionRequest(_message.Message):
-    __slots__ = ("member", "name", "action", "payload")
+    __slots__ = ("member", "name", "action", "payload", "resize")
     MEMBER_FIELD_NUMBER: _ClassVar[int]
     NAME_FIELD_NUMBER: _ClassVar[int]
     ACTION_FIELD_NUMBER: _ClassVar[int]
     PAYLOAD_FIELD_NUMBER: _ClassVar[int]
+    RESIZE_FIELD_NUMBER: _ClassVar[int]
     member: str
     name: str
     action: str
     payload: str
-    def __init__(self, member: _Optional[str] = ..., name: _Optional[str] = ..., action: _Optional[str] = ..., payload: _Optional[str] = ...) -> None: ...
+    resize: ResizePayload
+    def __init__(self, member: _Optional[str] = ..., name: _Optional[str] = ..., action: _Optional[str] = ..., payload: _Optional[str] = ..., resize: _Optional[_Union[ResizePayload, _Mapping]] = ...) -> None: ...
+
+class MetricDigest(_message.Message):
+    __slots__ = ("payload", "timestamp")
+    PAYLOAD_FIELD_NUMBER: _ClassVar[int]
+    TIMESTAMP_FIELD_NUMBER: _ClassVar[int]
+    payload: str
+    timestamp: float
+    def __init__(self, payload: _Optional[str] = ..., timestamp: _Optional[float] = ...) -> None: ...
+
+class MemberMessage(_message.Message):
+    __slots__ = ("member", "name", "sequence", "action", "digest")
+    MEMBER_FIELD_NUMBER: _ClassVar[int]
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    SEQUENCE_FIELD_NUMBER: _ClassVar[int]
+    ACTION_FIELD_NUMBER: _ClassVar[int]
+    DIGEST_FIELD_NUMBER: _ClassVar[int]
+    member: str
+    name: str
+    sequence: int
+    action: ActionRequest
+    digest: MetricDigest
+    def __init__(self, member: _Optional[str] = ..., name: _Optional[str] = ..., sequence: _Optional[int] = ..., action: _Optional[_Union[ActionRequest, _Mapping]] = ..., digest: _Optional[_Union[MetricDigest, _Mapping]] = ...) -> None: ...
+
+class ServiceMessage(_message.Message):
+    __slots__ = ("sequence", "response", "command", "payload")
+    SEQUENCE_FIELD_NUMBER: _ClassVar[int]
+    RESPONSE_FIELD_NUMBER: _ClassVar[int]
+    COMMAND_FIELD_NUMBER: _ClassVar[int]
+    PAYLOAD_FIELD_NUMBER: _ClassVar[int]
+    sequence: int
+    response: Response
+    command: str
+    payload: str
+    def __init__(self, sequence: _Optional[int] = ..., response: _Optional[_Union[Response, _Mapping]] = ..., command: _Optional[str] = ..., payload: _Optional[str] = ...) -> None: ...
 
 class Response(_message.Message):
-    __slots__ = ("payload", "status")
+    __slots__ = ("payload", "status", "retry_after")
     class ResultType(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
         __slots__ = ()
         UNSPECIFIED: _ClassVar[Response.ResultType]
@@ -41,6 +99,8 @@ class Response(_message.Message):
     EXISTS: Response.ResultType
     PAYLOAD_FIELD_NUMBER: _ClassVar[int]
     STATUS_FIELD_NUMBER: _ClassVar[int]
+    RETRY_AFTER_FIELD_NUMBER: _ClassVar[int]
     payload: str
     status: Response.ResultType
-    def __init__(self, payload: _Optional[str] = ..., status: _Optional[_Union[Response.ResultType, str]] = ...) -> None: ...
+    retry_after: float
+    def __init__(self, payload: _Optional[str] = ..., status: _Optional[_Union[Response.ResultType, str]] = ..., retry_after: _Optional[float] = ...) -> None: ...
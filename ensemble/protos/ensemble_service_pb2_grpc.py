@@ -44,6 +44,11 @@ class EnsembleOperatorStub(object):
                 request_serializer=ensemble__service__pb2.ActionRequest.SerializeToString,
                 response_deserializer=ensemble__service__pb2.Response.FromString,
                 _registered_method=True)
+        self.Stream = channel.stream_stream(
+                '/convergedcomputing.org.grpc.v1.EnsembleOperator/Stream',
+                request_serializer=ensemble__service__pb2.MemberMessage.SerializeToString,
+                response_deserializer=ensemble__service__pb2.ServiceMessage.FromString,
+                _registered_method=True)
 
 
 class EnsembleOperatorServicer(object):
@@ -61,6 +66,14 @@ class EnsembleOperatorServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Stream(self, request_iterator, context):
+        """A member keeps one long lived stream to send actions and metric
+        digests, and receive responses and commands from the service
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_EnsembleOperatorServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -74,6 +87,11 @@ def add_EnsembleOperatorServicer_to_server(servicer, server):
                     request_deserializer=ensemble__service__pb2.ActionRequest.FromString,
                     response_serializer=ensemble__service__pb2.Response.SerializeToString,
             ),
+            'Stream': grpc.stream_stream_rpc_method_handler(
+                    servicer.Stream,
+                    request_deserializer=ensemble__service__pb2.MemberMessage.FromString,
+                    response_serializer=ensemble__service__pb2.ServiceMessage.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'convergedcomputing.org.grpc.v1.EnsembleOperator', rpc_method_handlers)
@@ -138,3 +156,30 @@ class EnsembleOperator(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def Stream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/convergedcomputing.org.grpc.v1.EnsembleOperator/Stream',
+            ensemble__service__pb2.MemberMessage.SerializeToString,
+            ensemble__service__pb2.ServiceMessage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -1,3 +1,5 @@
+import functools
+
 import ensemble.defaults as defaults
 
 ensemble_config_schema = {
@@ -37,8 +39,34 @@ ensemble_config_schema = {
                     "nodes": {"type": "number", "default": 1},
                     "tasks": {"type": "number"},
                     "duration": {"type": "number"},
+                    # Jobs to keep in the queue (submitted, not started) at once
+                    "depth": {"type": "integer"},
+                    # Share of submissions when groups are submitted together
+                    "weight": {"type": "number"},
+                    # Groups to wait for (to finish, or finish with success)
+                    "after": {"type": ["string", "array"]},
+                    "afterok": {"type": ["string", "array"]},
+                    # A JSONL or CSV file with a job (command or parameters) per line
+                    "source": {"type": "string"},
+                    "format": {"type": "string", "enum": ["jsonl", "csv"]},
+                    "resume": {"type": "boolean", "default": True},
+                    # Parameters (lists or ranges) for a templated command, e.g., "echo {x}"
+                    "matrix": {
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": ["array", "object"],
+                            "properties": {
+                                "start": {"type": "number"},
+                                "stop": {"type": "number"},
+                                "step": {"type": "number"},
+                            },
+                            "required": ["stop"],
+                            "additionalProperties": False,
+                        },
+                    },
                 },
-                "required": ["name", "command"],
+                # A group needs a command, a source, or both (checked on load)
+                "required": ["name"],
             },
         },
         "rules": {
@@ -80,3 +108,41 @@ ensemble_config_schema = {
         },
     },
 }
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator():
+    """
+    Get the config validator, built once per process.
+
+    jsonschema.validate checks the schema itself and builds a new validator
+    on every call, which is most of the time it takes.
+    """
+    import jsonschema
+
+    return jsonschema.Draft7Validator(ensemble_config_schema)
+
+
+def validate(cfg, max_errors=20):
+    """
+    Validate an ensemble config, raising a jsonschema ValidationError.
+
+    The error is for the first problem found (with its path), and the
+    message lists every error, so they can all be fixed at once.
+    """
+    errors = list(get_validator().iter_errors(cfg))
+    if not errors:
+        return
+    import jsonschema
+
+    lines = [
+        f"  {'.'.join(str(part) for part in error.absolute_path) or '(root)'}: {error.message}"
+        for error in errors[:max_errors]
+    ]
+    if len(errors) > max_errors:
+        lines.append(f"  ... and {len(errors) - max_errors} more")
+    raise jsonschema.ValidationError(
+        f"Ensemble config has {len(errors)} errors:\n" + "\n".join(lines),
+        path=errors[0].absolute_path,
+        schema_path=errors[0].absolute_schema_path,
+    )
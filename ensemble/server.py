@@ -1,21 +1,38 @@
 import argparse
+import asyncio
+import contextlib
+import io
 import json
 import logging
 import os
+import queue
 import sys
+import threading
+import time
 from concurrent import futures
 
 import grpc
-from kubernetes import client, config
 
 import ensemble.defaults as defaults
 import ensemble.metrics as m
+import ensemble.service.loadgen as loadgen
 import ensemble.utils as utils
 from ensemble.protos import ensemble_service_pb2
 from ensemble.protos import ensemble_service_pb2_grpc as api
-
-# TODO what metrics do we want on the level of the grpc server?
-# probably something eventually related to fair share between ensembles?
+from ensemble.service.admission import AdmissionControl
+from ensemble.service.aio import AsyncEnsemble
+from ensemble.service.arbiter import FairShareArbiter
+from ensemble.service.idempotency import IdempotencyCache
+from ensemble.service.interceptor import (
+    AsyncMetricsInterceptor,
+    MetricsInterceptor,
+    is_error,
+    record_request,
+)
+from ensemble.service.memory import MemoryBackend
+from ensemble.service.resize import ResizeQueue
+from ensemble.service.status import StatusCache
+from ensemble.service.stream import MemberStreams
 
 
 def get_parser():
@@ -53,21 +70,346 @@ def get_parser():
         help="Host to run application (defaults to localhost)",
         default="localhost",
     )
+    start.add_argument(
+        "--asyncio",
+        help="Run an asyncio (grpc.aio) server, where requests do not each hold a worker thread",
+        action="store_true",
+        default=False,
+    )
+    start.add_argument(
+        "--max-concurrency",
+        help=f"Requests doing blocking work at once with --asyncio (defaults to {defaults.max_concurrency})",
+        default=defaults.max_concurrency,
+        type=int,
+    )
+    start.add_argument(
+        "--metrics-port",
+        help="Serve server metrics as json over http on this (localhost) port",
+        type=int,
+    )
     start.add_argument(
         "--kubernetes",
         help="Indicate running inside Kubernetes (will look for config and namespace, etc)",
         action="store_true",
         default=False,
     )
+    start.add_argument(
+        "--watch",
+        help="With --kubernetes, watch MiniClusters to answer lookups from a local cache",
+        action="store_true",
+        default=False,
+    )
+    start.add_argument(
+        "--max-streams",
+        help="Member streams open at once (each holds a worker) without --asyncio (defaults to half the workers)",
+        type=int,
+    )
+    start.add_argument(
+        "--max-in-flight",
+        help=f"Actions in flight before new ones are denied, 0 for no limit (defaults to {defaults.admission_max_in_flight})",
+        default=defaults.admission_max_in_flight,
+        type=int,
+    )
+    start.add_argument(
+        "--member-rate",
+        help=f"Actions per second for each member before they are denied, 0 for no limit (defaults to {defaults.admission_member_rate})",
+        default=defaults.admission_member_rate,
+        type=float,
+    )
+    start.add_argument(
+        "--member-burst",
+        help="Actions a member can send at once, above its rate (defaults to twice the rate)",
+        type=float,
+    )
+    start.add_argument(
+        "--node-budget",
+        help="Nodes shared by all MiniClusters, granted by weighted fair share (defaults to no budget)",
+        default=0,
+        type=int,
+    )
+    start.add_argument(
+        "--weight",
+        help="Fair share weight for a MiniCluster, as <name>=<weight> (can be repeated, defaults to 1)",
+        action="append",
+        default=[],
+    )
+    start.add_argument(
+        "--backend",
+        help="Store MiniClusters in kubernetes (with --kubernetes) or memory (for testing)",
+        choices=["kubernetes", "memory"],
+        default="kubernetes",
+    )
+    start.add_argument(
+        "--size",
+        help=f"Size of new MiniClusters with --backend memory (defaults to {defaults.memory_size})",
+        default=defaults.memory_size,
+        type=int,
+    )
+    start.add_argument(
+        "--min-size",
+        help=f"Minimum size of new MiniClusters with --backend memory (defaults to {defaults.memory_min_size})",
+        default=defaults.memory_min_size,
+        type=int,
+    )
+    start.add_argument(
+        "--max-size",
+        help=f"Maximum size of new MiniClusters with --backend memory (defaults to {defaults.memory_max_size})",
+        default=defaults.memory_max_size,
+        type=int,
+    )
+
+    # Generate load against the server
+    load = subparsers.add_parser(
+        "loadgen",
+        description="Send grow and shrink requests from simulated members, and report latency.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    load.add_argument(
+        "--target",
+        help="Host:port of a running server (defaults to starting one with a memory backend)",
+    )
+    load.add_argument(
+        "--members", help="Number of simulated members (defaults to 10)", default=10, type=int
+    )
+    load.add_argument(
+        "--rate", help="Requests per second (defaults to 100)", default=100, type=float
+    )
+    load.add_argument(
+        "--duration", help="Seconds to send requests (defaults to 10)", default=10, type=float
+    )
+    load.add_argument(
+        "--concurrency",
+        help="Requests the load generator has open at once (defaults to 32)",
+        default=32,
+        type=int,
+    )
+    load.add_argument(
+        "--workers",
+        help=f"Number of workers for the local server (defaults to {defaults.workers})",
+        default=defaults.workers,
+        type=int,
+    )
+    load.add_argument(
+        "--latency",
+        help="Seconds added to each memory backend call, to act like an API server",
+        default=0,
+        type=float,
+    )
+    load.add_argument(
+        "--min-size",
+        help="Minimum size of MiniClusters for the local server (defaults to 1)",
+        default=1,
+        type=int,
+    )
+    load.add_argument(
+        "--max-size",
+        help=f"Maximum size of MiniClusters for the local server (defaults to {loadgen.max_size})",
+        default=loadgen.max_size,
+        type=int,
+    )
+    load.add_argument("--seed", help="Random seed for the requests", type=int)
+    load.add_argument(
+        "--max-in-flight",
+        help=f"Actions in flight before new ones are denied, 0 for no limit (defaults to {defaults.admission_max_in_flight})",
+        default=defaults.admission_max_in_flight,
+        type=int,
+    )
+    load.add_argument(
+        "--member-rate",
+        help=f"Actions per second for each member before they are denied, 0 for no limit (defaults to {defaults.admission_member_rate})",
+        default=defaults.admission_member_rate,
+        type=float,
+    )
+    load.add_argument(
+        "--member-burst",
+        help="Actions a member can send at once, above its rate (defaults to twice the rate)",
+        type=float,
+    )
     return parser
 
 
-class EnsembleEndpoint(api.EnsembleOperatorServicer):
+class EnsembleServicer(api.EnsembleOperatorServicer):
     """
-    An EnsembleEndpoint runs a grpc service for an ensemble.
+    The EnsembleServicer provides the member stream, status, and admission
+    control shared by endpoints.
+
+    Actions (unary or sent over a stream) must be admitted, and are then
+    handled by perform_action, so endpoints only need to implement that.
+    Status is answered from the status cache, which endpoints keep up to date.
+    On the threaded server a stream holds a worker while it is open, so
+    max_streams limits how many can be open at once (None for no limit).
     """
 
+    def __init__(self, *args, admission=None, max_streams=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.admission = admission or AdmissionControl()
+        self.max_streams = max_streams
+        self.open_streams = 0
+        self.streams_lock = threading.Lock()
+        self.streams = MemberStreams()
+        self.status = StatusCache()
+        self.metrics = m.Metrics()
+
+    def RequestStatus(self, request, context):
+        """
+        Request the status of a member, as the service sees it.
+
+        The payload has the size, bounds, resizes still pending, and the
+        last action, so a member can tell if a resize has landed. A request
+        without a member gets the metrics of the service instead.
+        """
+        response = ensemble_service_pb2.Response()
+        response.status = ensemble_service_pb2.Response.ResultType.ERROR
+        if not request.member:
+            response.payload = json.dumps(self.metrics.to_dict())
+            response.status = ensemble_service_pb2.Response.ResultType.SUCCESS
+            return response
+        try:
+            status = self.get_status(request)
+        except Exception as err:
+            print(err)
+            return response
+
+        if status is None:
+            print(f"No status known for {request.member}/{request.name}")
+            return response
+        response.payload = json.dumps(status)
+        response.status = ensemble_service_pb2.Response.ResultType.SUCCESS
+        return response
+
+    def get_status(self, request):
+        """
+        Get the status for a member from the cache.
+        """
+        return self.status.get(f"{request.member}/{request.name}")
+
     def RequestAction(self, request, context):
+        """
+        Admit an action request, and perform it.
+        """
+        retry_after = self.admission.admit(f"{request.member}/{request.name}")
+        if retry_after:
+            return self.deny(request, retry_after)
+        try:
+            return self.perform_action(request, context)
+        finally:
+            self.admission.release()
+
+    def deny(self, request, retry_after):
+        """
+        Deny a request, with a hint (seconds) for when to try again.
+        """
+        self.metrics.requests.increment("denied")
+        print(
+            f"Denied {request.action} for {request.member}/{request.name}, retry after {retry_after:.2f}s"
+        )
+        response = ensemble_service_pb2.Response()
+        response.status = ensemble_service_pb2.Response.ResultType.DENIED
+        response.retry_after = retry_after
+        return response
+
+    def perform_action(self, request, context):
+        """
+        Perform an action that was admitted.
+        """
+        raise NotImplementedError
+
+    def Stream(self, request_iterator, context):
+        """
+        Keep a long lived stream with a member.
+
+        Requests are read (and answered) by a separate thread, and we yield
+        from the outbox, which the service can also put commands into. Over
+        the limit of streams, the stream is refused (RESOURCE_EXHAUSTED), and
+        the member can send requests on their own instead.
+        """
+        with self.streams_lock:
+            refused = self.max_streams is not None and self.open_streams >= self.max_streams
+            if not refused:
+                self.open_streams += 1
+        if refused:
+            self.metrics.requests.increment("streams-refused")
+            context.abort(
+                grpc.StatusCode.RESOURCE_EXHAUSTED,
+                f"Limit of {self.max_streams} streams is reached",
+            )
+        try:
+            outbox = queue.SimpleQueue()
+            reader = threading.Thread(
+                target=self.receive, args=(request_iterator, outbox, context), daemon=True
+            )
+            reader.start()
+            while True:
+                message = outbox.get()
+                if message is None:
+                    break
+                yield message
+        finally:
+            with self.streams_lock:
+                self.open_streams -= 1
+
+    def receive(self, request_iterator, outbox, context):
+        """
+        Read messages from a member stream until it closes.
+        """
+        key = None
+        try:
+            for message in request_iterator:
+                # The first message identifies the member
+                if key is None:
+                    key = f"{message.member}/{message.name}"
+                    self.streams.register(key, outbox)
+                outbox.put(self.handle_message(key, message, context))
+        except grpc.RpcError as err:
+            print(f"Stream for member {key} ended: {err}")
+        finally:
+            if key is not None:
+                self.streams.unregister(key, outbox)
+            outbox.put(None)
+
+    def handle_message(self, key, message, context):
+        """
+        Answer a single message from a member stream.
+        """
+        reply = ensemble_service_pb2.ServiceMessage(sequence=message.sequence)
+        kind = message.WhichOneof("message")
+        if kind == "action":
+            start = time.perf_counter()
+            response = self.RequestAction(message.action, context)
+            elapsed = time.perf_counter() - start
+            record_request(self.metrics, "Stream", message.action, elapsed, is_error(response))
+            reply.response.CopyFrom(response)
+        elif kind == "digest":
+            self.streams.record_digest(key, message.digest)
+            self.record_digest(key, message.digest)
+            reply.response.status = ensemble_service_pb2.Response.ResultType.SUCCESS
+        else:
+            print(f"Received unknown stream message from {key}")
+            reply.response.status = ensemble_service_pb2.Response.ResultType.ERROR
+        return reply
+
+    def record_digest(self, key, digest):
+        """
+        Use a metrics digest from a member. Endpoints can override this.
+        """
+        pass
+
+    def send_command(self, member, name, command, payload=None):
+        """
+        Send a command to a member, if it has a stream open.
+        """
+        message = ensemble_service_pb2.ServiceMessage(
+            command=command, payload=json.dumps(payload or {})
+        )
+        return self.streams.send(f"{member}/{name}", message)
+
+
+class EnsembleEndpoint(EnsembleServicer):
+    """
+    An EnsembleEndpoint runs a grpc service for an ensemble.
+    """
+
+    def perform_action(self, request, context):
         """
         Request an action is performed according to an algorithm.
 
@@ -78,7 +420,7 @@ class EnsembleEndpoint(api.EnsembleOperatorServicer):
         print(f"Member {request.member}")
         print(f"Name {request.name}")
         print(f"Action {request.action}")
-        print(f"Payload {request.payload}")
+        print(f"Payload {get_payload(request)}")
         response = ensemble_service_pb2.Response()
         print(response)
         if request.action == "grow":
@@ -87,29 +429,74 @@ class EnsembleEndpoint(api.EnsembleOperatorServicer):
             print("Received request to shrink")
         else:
             print("Received unknown request")
+        self.status.finish_action(f"{request.member}/{request.name}", request.action, 0)
         return response
 
 
-class KubernetesEnsemble(api.EnsembleOperatorServicer):
+class KubernetesEnsemble(EnsembleServicer):
     """
     A KubernetesEnsemble (endpoint) is expecting to be in a
     Kubernetes cluster.
+
+    MiniClusters are read and patched through a backend, which is the
+    API server unless another (e.g., in memory for testing) is provided.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, backend=None, pool_size=None, watch=False, arbiter=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.namespace = "default"
+
+        # The backend stores MiniClusters (the API server, unless testing)
+        if backend is None:
+            from ensemble.service.kubernetes import KubernetesBackend
+
+            backend = KubernetesBackend(pool_size=pool_size)
+        self.backend = backend
+
+        # Watch MiniClusters to answer lookups from a local cache. Caches are
+        # started by request workers, so only one of them starts each watch
+        self.watch = watch
+        self.caches = {}
+        self.caches_lock = threading.Lock()
+
+        # Group and version seen for each member (plural), to look up status
+        self.kinds = {}
+
+        # Serializes (and batches) resizes for each MiniCluster
+        self.resizer = ResizeQueue()
+
+        # Responses of recent requests by idempotency key
+        self.idempotency = IdempotencyCache()
+
+        # With a node budget, the arbiter decides how much of a grow to grant.
+        # Grants made later (when nodes are freed) are applied one at a time
+        self.arbiter = arbiter
+        self.granter = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ensemble-grant"
+        )
         self.setup()
 
-    @property
-    def client(self):
-        config.load_incluster_config()
-        return client.CoreV1Api()
+    def get_cache(self, group, version, plural):
+        """
+        Get (or start) the watch backed cache for a kind of MiniCluster.
 
-    @property
-    def custom_resource_client(self):
-        config.load_incluster_config()
-        return client.CustomObjectsApi()
+        This is None if the backend does not support a watch.
+        """
+        key = (group, version, plural)
+        if key in self.caches:
+            return self.caches[key]
+        with self.caches_lock:
+            if key not in self.caches:
+                self.caches[key] = self.backend.create_cache(
+                    self.namespace,
+                    group,
+                    version,
+                    plural,
+                    on_update=lambda mc: self.status.update_minicluster(
+                        f"{plural}/{mc['metadata']['name']}", mc
+                    ),
+                )
+            return self.caches[key]
 
     def setup(self):
         """
@@ -119,7 +506,7 @@ class KubernetesEnsemble(api.EnsembleOperatorServicer):
             self.namespace = utils.read_file(defaults.service_account_file)
         print(f"    Discovered namespace {self.namespace}")
 
-    def RequestAction(self, request, context):
+    def perform_action(self, request, context):
         """
         Request an action is performed according to an algorithm.
 
@@ -130,132 +517,275 @@ class KubernetesEnsemble(api.EnsembleOperatorServicer):
         print(f"Member {request.member}")
         print(f"Name {request.name}")
         print(f"Action {request.action}")
-        print(f"Payload {request.payload}")
+        print(f"Payload {get_payload(request)}")
 
         # Assume first an erroneous response
         response = ensemble_service_pb2.Response()
         response.status = ensemble_service_pb2.Response.ResultType.ERROR
 
-        # Payload has version and group, and must be loadable and have them!
+        # The payload must have group, version, and a change in size
         try:
-            payload = json.loads(request.payload)
-        except Exception as err:
-            print(f"Invalid payload {payload}: {err}")
-            return response
-
-        try:
-            minicluster = self.get_minicluster(request)
+            resize = get_resize_payload(request)
         except Exception as err:
             print(err)
             return response
 
-        # Request to grow
-        current_size = minicluster["spec"]["size"]
-        if request.action == "grow":
-            change_in_size = payload.get("grow") or 1
-            if change_in_size <= 0:
-                print(f"Invalid grow request {change_in_size}")
-                return response
-            prefix = "🍔 Received request to grow from"
+        if not resize.idempotency_key:
+            return self.resize(request, resize)
 
-        # Reset a counter, typically after an update event
-        elif request.action == "shrink":
-            change_in_size = payload.get("shrink") or 1
+        # A request sent again (with the same key) gets the first response
+        key = f"{request.member}/{request.name}/{resize.idempotency_key}"
+        entry, first = self.idempotency.claim(key)
+        if not first:
+            entry.done.wait()
+            print(f"Request {resize.idempotency_key} was already handled")
+            response.CopyFrom(entry.response)
+            return response
+        try:
+            response = self.resize(request, resize)
+        finally:
+            self.idempotency.finish(key, entry, response, keep=not is_error(response))
+        return response
 
-            # A shrink of 0 is still not allowed
-            if change_in_size == 0:
-                print(f"Invalid shrink request {change_in_size}")
-                return response
+    def resize(self, request, resize, granted=False):
+        """
+        Apply a resize request, and return the response.
 
-            # We assume that someone might put a positive here
-            if change_in_size > 0:
-                change_in_size = change_in_size * -1
+        If there is a node budget, a grow is first given to the arbiter,
+        and we only apply what it grants (unless it was already granted).
+        """
+        response = ensemble_service_pb2.Response()
+        response.status = ensemble_service_pb2.Response.ResultType.ERROR
+        change_in_size = resize.delta
+        if change_in_size > 0:
+            prefix = "🍔 Received request to grow from"
+        else:
             prefix = "🥕 Received request to shrink from"
 
-        # This can give a final dump / view of job info
-        else:
-            print(f"Received unknown request action {request.action}")
-            return response
+        key = f"{request.member}/{request.name}"
+        self.kinds[request.member] = (resize.group, resize.version)
 
-        # Calculate the updated size to grow or shrink
-        updated_size = calculate_updated_size(minicluster, change_in_size)
-        print(f"{prefix} {current_size} to {updated_size}")
+        queued = 0
+        if self.arbiter is not None and change_in_size > 0 and not granted:
+            try:
+                change_in_size, queued = self.arbitrate(request, resize)
+            except Exception as err:
+                print(err)
+                return response
+            if change_in_size == 0:
+                print(f"🍔 Request to grow {key} by {queued} is queued for the node budget")
+                response.payload = json.dumps({"granted": 0, "queued": queued})
+                response.status = ensemble_service_pb2.Response.ResultType.SUCCESS
+                return response
 
-        # Make the request to update the MiniCluster
+        # Resizes of the same MiniCluster are serialized, and batched when they pile up
+        self.status.start_action(key, request.action, change_in_size)
         try:
-            self.update_minicluster_size(minicluster, updated_size)
+            resized = self.resizer.resize(
+                f"{self.namespace}/{key}",
+                change_in_size,
+                lambda delta, fresh: self.resize_minicluster(request, resize, delta, fresh),
+            )
         except Exception as err:
             print(err)
+            self.status.finish_action(key, request.action, change_in_size, error=err)
+            if self.arbiter is not None and change_in_size > 0:
+                self.apply_grants(self.arbiter.cancel(key, change_in_size))
             return response
 
+        self.status.finish_action(
+            key, request.action, change_in_size, previous=resized.previous, size=resized.size
+        )
+
+        print(f"{prefix} {resized.previous} to {resized.size}")
+        if resized.batch > 1:
+            print(f"   Applied together with {resized.batch - 1} other request(s)")
+
+        # The arbiter needs to know the actual size (a shrink frees nodes for others)
+        if self.arbiter is not None:
+            self.apply_grants(self.arbiter.update(key, resized.size))
+        if self.arbiter is not None and change_in_size > 0:
+            response.payload = json.dumps({"granted": change_in_size, "queued": queued})
+            if queued:
+                print(f"   Granted {change_in_size}, and {queued} is queued for the node budget")
         response.status = ensemble_service_pb2.Response.ResultType.SUCCESS
         print(response)
         return response
 
-    def update_minicluster_size(self, minicluster, updated_size):
+    def arbitrate(self, request, resize):
         """
-        Update the minicluster size to a new desired size.
-        Validation should already have been done here for the size.
+        Ask the arbiter for a grow, returning nodes granted and queued.
+        """
+        key = f"{request.member}/{request.name}"
+
+        # The arbiter needs the current size the first time it sees a member
+        if not self.arbiter.known(key):
+            minicluster = self.read_minicluster(
+                request.member, request.name, resize.group, resize.version
+            )
+            self.apply_grants(self.arbiter.update(key, minicluster["spec"]["size"]))
+        return self.arbiter.request(key, resize.delta)
+
+    def apply_grants(self, grants):
+        """
+        Apply grows the arbiter granted to queued members (in the background).
+        """
+        for key, granted in grants:
+            self.granter.submit(self.apply_grant, key, granted)
+
+    def apply_grant(self, key, granted):
+        """
+        Apply one grant, and tell the member (if it has a stream open).
+        """
+        member, name = key.split("/", 1)
+        group, version = self.kinds[member]
+        resize = ensemble_service_pb2.ResizePayload(group=group, version=version, delta=granted)
+        request = ensemble_service_pb2.ActionRequest(
+            member=member, name=name, action="grow", resize=resize
+        )
+        response = self.resize(request, resize, granted=True)
+        status = self.status.get(key) or {}
+        self.send_command(
+            member,
+            name,
+            "granted",
+            {"grow": granted, "status": response.status, "size": status.get("size")},
+        )
+
+    def record_digest(self, key, digest):
+        """
+        Queue pressure (pending jobs) reported by a member goes to the arbiter.
         """
+        if self.arbiter is None:
+            return
         try:
-            k8s = self.custom_resource_client
+            pending = json.loads(digest.payload).get("queue", {}).get("pending", 0)
         except Exception as err:
-            raise ValueError(f"Cannot create an in cluster Kubernetes client: {err}")
+            print(f"Invalid digest from {key}: {err}")
+            return
+        self.arbiter.update_pressure(key, pending)
 
-        # Derive the group and version from apiVersion
+    def resize_minicluster(self, request, resize, change_in_size, fresh=False):
+        """
+        Read the MiniCluster, and patch it to the size after a change.
+
+        This returns the size before and after. If the MiniCluster changed
+        since we read it, the patch raises ResizeConflict and the resize
+        queue will call us again asking for a fresh read.
+        """
+        key = f"{request.member}/{request.name}"
+        minicluster = self.read_minicluster(
+            request.member, request.name, resize.group, resize.version, fresh=fresh
+        )
+        self.status.update_minicluster(key, minicluster)
+        current_size = minicluster["spec"]["size"]
+
+        # Calculate the updated size to grow or shrink
+        updated_size = calculate_updated_size(minicluster, change_in_size)
+        if updated_size != current_size:
+            self.status.update_minicluster(
+                key, self.update_minicluster_size(minicluster, updated_size, request.member)
+            )
+        return current_size, updated_size
+
+    def update_minicluster_size(self, minicluster, updated_size, plural="miniclusters"):
+        """
+        Update the minicluster size to a new desired size.
+        Validation should already have been done here for the size.
+        """
+        with self.metrics.timed(f"{self.backend.name}:update"):
+            updated = self.backend.update_size(minicluster, updated_size, plural=plural)
+
+        # Don't wait for the watch to see our own change
         api_version = minicluster["apiVersion"]
         group, version = api_version.split("/", 1)
+        cache = self.caches.get((group, version, plural))
+        if cache is not None:
+            cache.update(updated)
+        return updated
 
-        # We create a patch to adjust the size
-        patch = {"spec": {"size": updated_size}}
-        try:
-            k8s.patch_namespaced_custom_object(
-                group=group,
-                version=version,
-                plural="miniclusters",
-                name=minicluster["metadata"]["name"],
-                namespace=minicluster["metadata"]["namespace"],
-                body=patch,
-            )
-        except Exception as err:
-            raise ValueError(f"Issue patching MiniCluster: {err}")
+    def get_status(self, request):
+        """
+        Get the status for a member from the cache.
 
-    def get_minicluster(self, request):
+        If we don't know the member yet but know its kind (group and
+        version) from the request or an earlier action, we look it up
+        once to fill the cache.
         """
-        Given a payload from the ensemble member, retrieve the MiniCluster
+        key = f"{request.member}/{request.name}"
+        status = self.status.get(key)
+        if status is not None:
+            if self.arbiter is not None:
+                status["arbiter"] = self.arbiter.get(key)
+            return status
+        if request.payload.group and request.payload.version:
+            group, version = request.payload.group, request.payload.version
+        elif request.member in self.kinds:
+            group, version = self.kinds[request.member]
+        else:
+            return
+        minicluster = self.read_minicluster(request.member, request.name, group, version)
+        self.status.update_minicluster(key, minicluster)
+        return self.status.get(key)
+
+    def read_minicluster(self, plural, minicluster_name, group, version, fresh=False):
         """
-        # The payload has already been validated (to load) by the calling function
-        payload = json.loads(request.payload)
+        Read a MiniCluster from the cache (if watching) or the backend.
+        """
+        # If we have a watch, the cache can answer without the API server
+        if self.watch and not fresh:
+            cache = self.get_cache(group, version, plural)
+            minicluster = cache.get(minicluster_name) if cache is not None else None
+            if minicluster is not None:
+                return minicluster
+
+        with self.metrics.timed(f"{self.backend.name}:get"):
+            return self.backend.get_minicluster(
+                self.namespace, plural, minicluster_name, group, version
+            )
 
-        # Create the kubernetes client using an in cluster config
-        try:
-            k8s = self.custom_resource_client
-        except Exception as err:
-            raise ValueError(f"Cannot create an in cluster Kubernetes client: {err}")
 
-        group = payload["group"]
-        version = payload["version"]
+def get_payload(request):
+    """
+    Get the payload of an action request, typed or json.
+    """
+    kind = request.WhichOneof("body")
+    return getattr(request, kind) if kind else None
+
+
+def get_resize_payload(request):
+    """
+    Get the resize payload of a grow or shrink request.
+
+    Members that don't send a typed payload send json, with the change
+    in size under the action name (e.g., {"grow": 2}) and we convert it.
+    """
+    if request.action not in ["grow", "shrink"]:
+        raise ValueError(f"Received unknown request action {request.action}")
 
-        # Find the minicluster in the namespace (works via custom rbac and service account)
+    if request.WhichOneof("body") == "resize":
+        resize = request.resize
+    else:
         try:
-            miniclusters = k8s.list_namespaced_custom_object(
-                group=group, version=version, plural=request.member, namespace=self.namespace
-            )
+            payload = json.loads(request.payload)
         except Exception as err:
-            raise ValueError(f"Cannot get MiniCluster: {err}")
+            raise ValueError(f"Invalid payload {request.payload}: {err}")
+        resize = ensemble_service_pb2.ResizePayload(
+            group=payload.get("group") or "",
+            version=payload.get("version") or "",
+            delta=payload.get(request.action) or 1,
+            idempotency_key=payload.get("idempotency_key") or "",
+        )
 
-        # We need to find index 0
-        minicluster_name = request.name
-        minicluster = None
-        for mc in miniclusters.get("items", []):
-            if mc["metadata"]["name"] == minicluster_name:
-                minicluster = mc
-                break
+    if not resize.group or not resize.version:
+        raise ValueError(f"Payload for {request.action} is missing a group or version")
 
-        # We didn't find a matching name.
-        if minicluster is None:
-            raise ValueError(f"MiniCluster with name {minicluster_name} was not found")
-        return minicluster
+    # We assume that someone might put a positive shrink here
+    if request.action == "shrink" and resize.delta > 0:
+        resize.delta = resize.delta * -1
+    if resize.delta == 0 or (request.action == "grow" and resize.delta < 0):
+        raise ValueError(f"Invalid {request.action} request {resize.delta}")
+    return resize
 
 
 def calculate_updated_size(minicluster, change_size):
@@ -287,28 +817,176 @@ def calculate_updated_size(minicluster, change_size):
     return updated_size
 
 
+def get_max_streams(args):
+    """
+    Get how many member streams can be open at once on the threaded server.
+
+    Each open stream holds a worker, so we leave at least two workers for
+    requests (one admitted, and one to deny). The asyncio server has no limit.
+    """
+    if args.asyncio:
+        return
+    limit = args.max_streams if args.max_streams is not None else args.workers // 2
+    return max(0, min(limit, args.workers - 2))
+
+
+def get_admission(args, workers=None, streams=0):
+    """
+    Get admission control for actions from the command line.
+
+    With a thread pool of workers, a request is only admitted (or denied)
+    once a worker takes it. Workers that are not held by streams are for
+    requests, and we keep one of them free of admitted requests, so when
+    the budget is used a new request is denied right away instead of
+    waiting in the pool.
+    """
+    max_in_flight = args.max_in_flight
+    if workers:
+        workers = workers - (streams or 0)
+    if workers and max_in_flight > 0 and max_in_flight >= workers:
+        max_in_flight = max(1, workers - 1)
+        print(f"Actions in flight are limited to {max_in_flight}, for {workers} request workers")
+    return AdmissionControl(
+        max_in_flight=max_in_flight,
+        member_rate=args.member_rate,
+        member_burst=args.member_burst,
+    )
+
+
+def get_arbiter(args):
+    """
+    Get the fair share arbiter from the command line, if there is a budget.
+    """
+    if args.node_budget <= 0:
+        return
+    weights = {}
+    for item in args.weight:
+        name, weight = item.rsplit("=", 1)
+        weights[name] = float(weight)
+    return FairShareArbiter(args.node_budget, weights=weights)
+
+
 def serve(args):
     """
     serve the ensemble endpoint for the MiniCluster
     """
     global metrics
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=args.workers))
 
-    endpoint = EnsembleEndpoint()
-    if args.kubernetes:
-        endpoint = KubernetesEnsemble()
+    max_streams = get_max_streams(args)
+    admission = get_admission(
+        args, workers=None if args.asyncio else args.workers, streams=max_streams
+    )
+    arbiter = get_arbiter(args)
+    endpoint = EnsembleEndpoint(admission=admission, max_streams=max_streams)
+    if args.backend == "memory":
+        endpoint = KubernetesEnsemble(
+            backend=MemoryBackend(size=args.size, min_size=args.min_size, max_size=args.max_size),
+            watch=args.watch,
+            admission=admission,
+            arbiter=arbiter,
+            max_streams=max_streams,
+        )
+    elif args.kubernetes:
+        endpoint = KubernetesEnsemble(
+            pool_size=args.workers,
+            watch=args.watch,
+            admission=admission,
+            arbiter=arbiter,
+            max_streams=max_streams,
+        )
+
+    # The plain endpoint does not resize, so it has nothing to share
+    elif arbiter is not None:
+        sys.exit("A --node-budget requires --kubernetes or --backend memory")
+    if args.asyncio:
+        return asyncio.run(serve_aio(args, endpoint))
+
+    # Kick off metrics collections
+    metrics = endpoint.metrics
+    if args.metrics_port:
+        m.serve_metrics(metrics, args.metrics_port)
+
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=args.workers),
+        interceptors=[MetricsInterceptor(metrics)],
+    )
     api.add_EnsembleOperatorServicer_to_server(endpoint, server)
 
     host = f"{args.host}:{args.port}"
     server.add_insecure_port(f"{host}")
     print(f"🥞️ Starting ensemble endpoint at {host}")
-
-    # Kick off metrics collections
-    metrics = m.Metrics()
     server.start()
     server.wait_for_termination()
 
 
+async def serve_aio(args, endpoint):
+    """
+    serve the ensemble endpoint with an asyncio server
+    """
+    global metrics
+
+    # Kick off metrics collections
+    metrics = endpoint.metrics
+    if args.metrics_port:
+        m.serve_metrics(metrics, args.metrics_port)
+
+    server = grpc.aio.server(interceptors=[AsyncMetricsInterceptor(metrics)])
+    api.add_EnsembleOperatorServicer_to_server(
+        AsyncEnsemble(endpoint, args.max_concurrency), server
+    )
+
+    host = f"{args.host}:{args.port}"
+    server.add_insecure_port(f"{host}")
+    print(f"🥞️ Starting asyncio ensemble endpoint at {host}")
+    await server.start()
+    await server.wait_for_termination()
+
+
+def run_loadgen(args):
+    """
+    Generate load against a server, starting one with a memory backend if needed.
+    """
+    server = None
+    target = args.target
+    if not target:
+        backend = MemoryBackend(
+            size=min(max(loadgen.start_size, args.min_size), args.max_size),
+            min_size=args.min_size,
+            max_size=args.max_size,
+            latency=args.latency,
+        )
+        endpoint = KubernetesEnsemble(
+            backend=backend, admission=get_admission(args, workers=args.workers)
+        )
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=args.workers),
+            interceptors=[MetricsInterceptor(endpoint.metrics)],
+        )
+        api.add_EnsembleOperatorServicer_to_server(endpoint, server)
+        port = server.add_insecure_port("localhost:0")
+        server.start()
+        target = f"localhost:{port}"
+
+    print(f"🏋️ Generating load against {target}")
+    generator = loadgen.LoadGenerator(
+        target,
+        members=args.members,
+        rate=args.rate,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        seed=args.seed,
+    )
+
+    # The server prints every request, which we don't want to see here
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = generator.run()
+    if server is not None:
+        server.stop(0)
+    loadgen.show_report(report)
+    if not report["correct"]:
+        sys.exit(1)
+
+
 def main():
     """
     Light wrapper main to provide a parser with port/workers
@@ -322,6 +1000,8 @@ def main():
     # If an error occurs while parsing the arguments, the interpreter will exit with value 2
     args, _ = parser.parse_known_args()
     logging.basicConfig()
+    if args.command == "loadgen":
+        return run_loadgen(args)
     serve(args)
 
 
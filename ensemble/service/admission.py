@@ -0,0 +1,81 @@
+import threading
+import time
+
+import ensemble.defaults as defaults
+
+
+class TokenBucket:
+    """
+    A token bucket allows a rate of requests (per second), with bursts.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take a token, returning 0, or the seconds until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionControl:
+    """
+    Admission control decides if the service takes on a request.
+
+    There is a budget of requests in flight for the whole service, and each
+    member has a token bucket so one member asking too often does not slow
+    down everyone else. A request that is not admitted should be answered
+    right away (denied) with the returned retry after hint (seconds). A
+    limit of 0 (or less) turns that check off.
+    """
+
+    def __init__(self, max_in_flight=None, member_rate=None, member_burst=None):
+        self.max_in_flight = (
+            max_in_flight if max_in_flight is not None else defaults.admission_max_in_flight
+        )
+        self.member_rate = (
+            member_rate if member_rate is not None else defaults.admission_member_rate
+        )
+        self.member_burst = member_burst or max(1, self.member_rate * 2)
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.buckets = {}
+        self.denied = 0
+
+    def admit(self, member):
+        """
+        Admit a request from a member, returning 0 or a retry after hint.
+
+        An admitted request must be released when it is done.
+        """
+        with self.lock:
+            retry_after = 0
+            if self.max_in_flight > 0 and self.in_flight >= self.max_in_flight:
+                retry_after = defaults.admission_retry_after
+            elif self.member_rate > 0:
+                bucket = self.buckets.get(member)
+                if bucket is None:
+                    bucket = TokenBucket(self.member_rate, self.member_burst)
+                    self.buckets[member] = bucket
+                retry_after = bucket.take()
+
+            if retry_after:
+                self.denied += 1
+                return retry_after
+            self.in_flight += 1
+            return 0
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
@@ -0,0 +1,106 @@
+import asyncio
+from concurrent import futures
+
+import grpc
+
+from ensemble.protos import ensemble_service_pb2_grpc as api
+
+
+class AsyncOutbox:
+    """
+    An outbox for a stream on the asyncio server. Put can be called from
+    any thread (e.g., a synchronous handler sending a command), and the
+    message is handed to the event loop that owns the queue.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class AsyncEnsemble(api.EnsembleOperatorServicer):
+    """
+    AsyncEnsemble provides asynchronous handlers (for grpc.aio) on top of
+    an ensemble endpoint.
+
+    An idle request or stream does not hold a thread. The blocking work of a
+    request (e.g., calls to the Kubernetes API) is run on an executor, and a
+    semaphore limits how many requests are doing that work at once.
+    """
+
+    def __init__(self, endpoint, max_concurrency):
+        self.endpoint = endpoint
+        self.limit = asyncio.Semaphore(max_concurrency)
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ensemble-aio"
+        )
+
+    async def run(self, func, *args):
+        """
+        Run a blocking function on the executor, within the limit.
+        """
+        async with self.limit:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def RequestStatus(self, request, context):
+        return await self.run(self.endpoint.RequestStatus, request, context)
+
+    async def RequestAction(self, request, context):
+        """
+        Admit an action before it waits for the limit, so an overloaded
+        service answers right away instead of queueing the request.
+        """
+        admission = self.endpoint.admission
+        retry_after = admission.admit(f"{request.member}/{request.name}")
+        if retry_after:
+            return self.endpoint.deny(request, retry_after)
+        try:
+            return await self.run(self.endpoint.perform_action, request, context)
+        finally:
+            admission.release()
+
+    async def Stream(self, request_iterator, context):
+        """
+        Keep a long lived stream with a member.
+
+        This mirrors the synchronous stream, but reading is a task on the
+        event loop instead of a thread.
+        """
+        outbox = AsyncOutbox(asyncio.get_running_loop())
+        reader = asyncio.create_task(self.receive(request_iterator, outbox, context))
+        try:
+            while True:
+                message = await outbox.get()
+                if message is None:
+                    break
+                yield message
+        finally:
+            reader.cancel()
+
+    async def receive(self, request_iterator, outbox, context):
+        """
+        Read messages from a member stream until it closes.
+        """
+        streams = self.endpoint.streams
+        key = None
+        try:
+            async for message in request_iterator:
+                # The first message identifies the member
+                if key is None:
+                    key = f"{message.member}/{message.name}"
+                    streams.register(key, outbox)
+                reply = await self.run(self.endpoint.handle_message, key, message, context)
+                outbox.put(reply)
+        except grpc.RpcError as err:
+            print(f"Stream for member {key} ended: {err}")
+        finally:
+            if key is not None:
+                streams.unregister(key, outbox)
+            outbox.put(None)
@@ -0,0 +1,227 @@
+import heapq
+import itertools
+import math
+import threading
+
+
+class Allocation:
+    """
+    An allocation is what the arbiter knows about one member.
+    """
+
+    def __init__(self, key, weight=1):
+        self.key = key
+        self.weight = weight
+        self.size = 0
+        self.queued = 0
+
+        # Queue pressure reported by the member (e.g., pending jobs)
+        self.pressure = 0
+
+        # The sequence of our current entry in the heap (others are stale)
+        self.entry = None
+
+    @property
+    def usage(self):
+        """
+        Size normalized by weight, the lower the more deserving.
+        """
+        return self.size / self.weight
+
+
+class FairShareArbiter:
+    """
+    The FairShareArbiter divides a budget of nodes between members that
+    grow, by weighted fair share.
+
+    Each member is entitled to the budget times its weight over the total
+    weight (of members we know about). A grow is granted right away if
+    nobody is waiting and there are free nodes. If others are waiting, a
+    member only gets what is left of its own share, and the rest is queued.
+    When nodes are freed (a member shrinks) queued requests are granted to
+    the member with the lowest usage (size over weight) first, breaking ties
+    by higher queue pressure and then order of arrival.
+
+    Queued requests are kept in a heap, so a decision is O(log n). When a
+    queued member changes (size or pressure) it is pushed again with its new
+    priority, and the entry it had is stale and skipped when it comes to the
+    top.
+    """
+
+    def __init__(self, budget, weights=None, default_weight=1):
+        self.budget = budget
+        self.weights = weights or {}
+        self.default_weight = default_weight
+
+        self.lock = threading.Lock()
+        self.members = {}
+        self.allocated = 0
+        self.total_weight = 0
+
+        # Entries are (usage, -pressure, sequence, key), and waiting has
+        # the keys of members with queued nodes
+        self.heap = []
+        self.waiting = set()
+        self.sequence = itertools.count()
+
+    @property
+    def free(self):
+        return max(0, self.budget - self.allocated)
+
+    def get_allocation(self, key):
+        """
+        Get (or create) the allocation of a member. The lock must be held.
+
+        Weights are configured by MiniCluster name (the last part of the key).
+        """
+        allocation = self.members.get(key)
+        if allocation is None:
+            name = key.rsplit("/", 1)[-1]
+            weight = self.weights.get(key) or self.weights.get(name) or self.default_weight
+            allocation = Allocation(key, weight)
+            self.members[key] = allocation
+            self.total_weight += weight
+        return allocation
+
+    def share(self, allocation):
+        """
+        The fair share of a member (nodes). The lock must be held.
+        """
+        return self.budget * allocation.weight / self.total_weight
+
+    def known(self, key):
+        with self.lock:
+            return key in self.members
+
+    def push(self, allocation):
+        """
+        Queue a member with its current priority, if it has queued nodes.
+        The lock must be held.
+        """
+        if allocation.queued <= 0:
+            allocation.entry = None
+            self.waiting.discard(allocation.key)
+            return
+        allocation.entry = next(self.sequence)
+        self.waiting.add(allocation.key)
+        entry = (allocation.usage, -allocation.pressure, allocation.entry, allocation.key)
+        heapq.heappush(self.heap, entry)
+
+        # Don't let stale entries pile up (e.g., pressure updates while no nodes are free)
+        if len(self.heap) > 2 * len(self.waiting) + 16:
+            self.heap = [entry for entry in self.heap if self.is_current(entry)]
+            heapq.heapify(self.heap)
+
+    def is_current(self, entry):
+        """
+        Determine if a heap entry is the current one of its member.
+        """
+        return self.members[entry[3]].entry == entry[2]
+
+    def request(self, key, delta):
+        """
+        Request to grow a member, returning nodes granted and nodes queued.
+
+        Granted nodes count as allocated right away, and update() should
+        be called with the actual size once the resize is done.
+        """
+        with self.lock:
+            allocation = self.get_allocation(key)
+            granted = min(delta, self.free)
+
+            # If others are waiting, we can only take what is left of our share
+            if self.waiting - {key}:
+                headroom = max(0, int(self.share(allocation) - allocation.size))
+                granted = min(granted, headroom)
+
+            allocation.size += granted
+            self.allocated += granted
+            queued = delta - granted
+            if queued > 0 or (allocation.queued and granted):
+                allocation.queued += queued
+                self.push(allocation)
+            return granted, queued
+
+    def update(self, key, size):
+        """
+        Update a member to its actual size, returning grants that can be
+        made to queued members with nodes that were freed.
+        """
+        with self.lock:
+            allocation = self.get_allocation(key)
+            self.allocated += size - allocation.size
+            allocation.size = size
+            if allocation.queued:
+                self.push(allocation)
+            return self.drain()
+
+    def cancel(self, key, granted):
+        """
+        Give back nodes that were granted but not used (e.g., the resize
+        failed), returning grants that can now be made to others.
+        """
+        with self.lock:
+            allocation = self.get_allocation(key)
+            allocation.size -= granted
+            self.allocated -= granted
+            if allocation.queued:
+                self.push(allocation)
+            return self.drain()
+
+    def update_pressure(self, key, pressure):
+        """
+        Update the queue pressure reported by a member.
+        """
+        with self.lock:
+            allocation = self.get_allocation(key)
+            if allocation.pressure == pressure:
+                return
+            allocation.pressure = pressure
+            if allocation.queued:
+                self.push(allocation)
+
+    def drain(self):
+        """
+        Grant queued requests while there are free nodes. The lock must be held.
+        """
+        grants = []
+        while self.heap and self.free > 0:
+            entry = heapq.heappop(self.heap)
+
+            # The member changed since (it has a newer entry) or is not waiting
+            if not self.is_current(entry):
+                continue
+            key = entry[3]
+            allocation = self.members[key]
+
+            # If others are still waiting, grant up to our share. We have the
+            # lowest usage, so if we are at our share so is everyone waiting,
+            # and nodes are handed out one at a time (by usage).
+            granted = min(allocation.queued, self.free)
+            if self.waiting - {key}:
+                headroom = math.ceil(self.share(allocation) - allocation.size)
+                granted = min(granted, max(1, headroom))
+            allocation.queued -= granted
+            allocation.size += granted
+            self.allocated += granted
+            grants.append((key, granted))
+            self.push(allocation)
+        return grants
+
+    def get(self, key):
+        """
+        Get the allocation of a member as a dict, or None.
+        """
+        with self.lock:
+            allocation = self.members.get(key)
+            if allocation is None:
+                return
+            return {
+                "weight": allocation.weight,
+                "share": self.share(allocation),
+                "allocated": allocation.size,
+                "queued": allocation.queued,
+                "pressure": allocation.pressure,
+                "budget": self.budget,
+                "free": self.free,
+            }
@@ -0,0 +1,47 @@
+def is_newer(current, other):
+    """
+    Determine if a resource (other) is newer than the one we have (current).
+
+    Resource versions are meant to be opaque, but in practice they are
+    integers and we use that to not go back in time when a watch event for
+    an older version arrives after we saved the result of a patch.
+    """
+    if current is None:
+        return True
+    try:
+        return int(other["metadata"]["resourceVersion"]) >= int(
+            current["metadata"]["resourceVersion"]
+        )
+    except (KeyError, TypeError, ValueError):
+        return True
+
+
+class Backend:
+    """
+    A Backend stores MiniClusters for the ensemble service.
+
+    The service only needs to read a MiniCluster and update its size. An
+    update must be rejected with ResizeConflict if the MiniCluster changed
+    since it was read (the resource version is different), and a MiniCluster
+    that does not exist is a ValueError.
+    """
+
+    name = "backend"
+
+    def get_minicluster(self, namespace, plural, name, group, version):
+        """
+        Get a MiniCluster by name.
+        """
+        raise NotImplementedError
+
+    def update_size(self, minicluster, size, plural="miniclusters"):
+        """
+        Update the size of a MiniCluster, returning the updated MiniCluster.
+        """
+        raise NotImplementedError
+
+    def create_cache(self, namespace, group, version, plural, on_update=None):
+        """
+        Create a watch backed cache for a kind of MiniCluster, if supported.
+        """
+        return
@@ -0,0 +1,57 @@
+import collections
+import threading
+
+import ensemble.defaults as defaults
+
+
+class IdempotentEntry:
+    """
+    An entry is the response for one idempotency key, once there is one.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+class IdempotencyCache:
+    """
+    The IdempotencyCache remembers responses by idempotency key, so a
+    request that is sent again (e.g., a retry after a timeout) is answered
+    with the first response instead of being applied twice.
+
+    A duplicate that arrives while the first is still running waits for it.
+    We only keep the most recent keys, and a key that ended in an error is
+    forgotten so it can be tried again.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or defaults.idempotency_keys
+        self.lock = threading.Lock()
+        self.items = collections.OrderedDict()
+
+    def claim(self, key):
+        """
+        Claim a key, returning the entry and True if we are the first.
+        """
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is not None:
+                self.items.move_to_end(key)
+                return entry, False
+            entry = IdempotentEntry()
+            self.items[key] = entry
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+            return entry, True
+
+    def finish(self, key, entry, response, keep=True):
+        """
+        Save the response for a key we claimed, and wake up anyone waiting.
+        """
+        entry.response = response
+        if not keep:
+            with self.lock:
+                if self.items.get(key) is entry:
+                    del self.items[key]
+        entry.done.set()
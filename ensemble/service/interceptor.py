@@ -0,0 +1,157 @@
+import time
+
+import grpc
+
+from ensemble.protos import ensemble_service_pb2
+
+
+def request_labels(method, request):
+    """
+    Get the histogram names to record for a request.
+
+    Every request counts for its method, and requests that name a member
+    or action (e.g., a resize) also count for those.
+    """
+    labels = [f"method:{method}"]
+    member = getattr(request, "member", None)
+    if member:
+        labels.append(f"member:{member}/{request.name}")
+    action = getattr(request, "action", None)
+    if action:
+        labels.append(f"action:{action}")
+    return labels
+
+
+def is_error(response):
+    """
+    Our handlers answer an error with a status, and not an exception.
+    """
+    status = getattr(response, "status", None)
+    return status == ensemble_service_pb2.Response.ResultType.ERROR
+
+
+def record_request(metrics, method, request, elapsed, error=False):
+    """
+    Record the latency (and error) of a request under each of its labels.
+    """
+    for label in request_labels(method, request):
+        metrics.requests.observe(label, elapsed)
+        if error:
+            metrics.requests.increment(f"{label}:errors")
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """
+    The MetricsInterceptor records latency, errors, and requests in flight
+    for every unary call, and the number of streams open.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return handler
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+
+        if handler.unary_unary is not None:
+            return grpc.unary_unary_rpc_method_handler(
+                self.wrap_unary(method, handler.unary_unary),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        if handler.stream_stream is not None:
+            return grpc.stream_stream_rpc_method_handler(
+                self.wrap_stream(method, handler.stream_stream),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        return handler
+
+    def start(self):
+        self.metrics.tick()
+        self.metrics.requests.increment("in_flight")
+        return time.perf_counter()
+
+    def finish(self, method, request, start, error):
+        self.metrics.requests.increment("in_flight", -1)
+        record_request(self.metrics, method, request, time.perf_counter() - start, error)
+
+    def wrap_unary(self, method, behavior):
+        def wrapper(request, context):
+            start = self.start()
+            error = True
+            try:
+                response = behavior(request, context)
+                error = is_error(response)
+                return response
+            finally:
+                self.finish(method, request, start, error)
+
+        return wrapper
+
+    def wrap_stream(self, method, behavior):
+        def wrapper(request_iterator, context):
+            self.metrics.requests.increment("streams_open")
+            try:
+                yield from behavior(request_iterator, context)
+            finally:
+                self.metrics.requests.increment("streams_open", -1)
+
+        return wrapper
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """
+    The AsyncMetricsInterceptor records the same metrics for a grpc.aio server,
+    where handlers are coroutines (and streams async generators).
+    """
+
+    def __init__(self, metrics):
+        self.sync = MetricsInterceptor(metrics)
+        self.metrics = metrics
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return handler
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+
+        if handler.unary_unary is not None:
+            return grpc.unary_unary_rpc_method_handler(
+                self.wrap_unary(method, handler.unary_unary),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        if handler.stream_stream is not None:
+            return grpc.stream_stream_rpc_method_handler(
+                self.wrap_stream(method, handler.stream_stream),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        return handler
+
+    def wrap_unary(self, method, behavior):
+        async def wrapper(request, context):
+            start = self.sync.start()
+            error = True
+            try:
+                response = await behavior(request, context)
+                error = is_error(response)
+                return response
+            finally:
+                self.sync.finish(method, request, start, error)
+
+        return wrapper
+
+    def wrap_stream(self, method, behavior):
+        async def wrapper(request_iterator, context):
+            self.metrics.requests.increment("streams_open")
+            try:
+                async for message in behavior(request_iterator, context):
+                    yield message
+            finally:
+                self.metrics.requests.increment("streams_open", -1)
+
+        return wrapper
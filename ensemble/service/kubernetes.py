@@ -0,0 +1,247 @@
+import threading
+
+from kubernetes import client, config, watch
+from kubernetes.client.rest import ApiException
+
+import ensemble.defaults as defaults
+from ensemble.service.backend import Backend, is_newer
+from ensemble.service.resize import ResizeConflict
+
+
+class MiniClusterCache:
+    """
+    A MiniClusterCache holds MiniCluster objects in a namespace by name,
+    kept up to date by a watch (in a background thread).
+
+    The watch starts with a list (so the cache is complete) and resumes
+    from the last resource version seen. If that version is too old (410)
+    we list again. If on_update is provided, it is called with each
+    MiniCluster the cache accepts (e.g., to update a status view).
+    """
+
+    def __init__(
+        self,
+        custom_resource_client,
+        namespace,
+        group,
+        version,
+        plural="miniclusters",
+        on_update=None,
+    ):
+        self.k8s = custom_resource_client
+        self.on_update = on_update
+        self.namespace = namespace
+        self.group = group
+        self.version = version
+        self.plural = plural
+
+        self.lock = threading.Lock()
+        self.items = {}
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def get(self, name):
+        """
+        Get a MiniCluster by name, or None if we don't know about it (yet).
+        """
+        if not self.ready.is_set():
+            return
+        with self.lock:
+            return self.items.get(name)
+
+    def update(self, minicluster):
+        """
+        Update the cache with a MiniCluster we know is current (e.g., the
+        result of our own patch) so we don't wait for the watch event.
+        """
+        name = minicluster["metadata"]["name"]
+        with self.lock:
+            accepted = is_newer(self.items.get(name), minicluster)
+            if accepted:
+                self.items[name] = minicluster
+        if accepted:
+            self.notify(minicluster)
+
+    def notify(self, minicluster):
+        """
+        Tell the listener (if there is one) about an accepted MiniCluster.
+        """
+        if self.on_update is not None:
+            self.on_update(minicluster)
+
+    def list(self):
+        """
+        List all MiniClusters to fill the cache, returning the resource version.
+        """
+        listing = self.k8s.list_namespaced_custom_object(
+            group=self.group, version=self.version, plural=self.plural, namespace=self.namespace
+        )
+        with self.lock:
+            self.items = {mc["metadata"]["name"]: mc for mc in listing.get("items", [])}
+        for minicluster in listing.get("items", []):
+            self.notify(minicluster)
+        self.ready.set()
+        return listing["metadata"]["resourceVersion"]
+
+    def run(self):
+        """
+        Watch MiniClusters until stopped.
+        """
+        resource_version = None
+        while not self.stopped.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self.list()
+                stream = watch.Watch().stream(
+                    self.k8s.list_namespaced_custom_object,
+                    group=self.group,
+                    version=self.version,
+                    plural=self.plural,
+                    namespace=self.namespace,
+                    resource_version=resource_version,
+                    timeout_seconds=300,
+                )
+                for event in stream:
+                    resource_version = self.handle_event(event) or resource_version
+                    if self.stopped.is_set():
+                        break
+
+            # The resource version is too old, and we need to list again
+            except ApiException as err:
+                if err.status != 410:
+                    print(f"Watch for {self.plural} had an error: {err}")
+                    self.stopped.wait(1)
+                resource_version = None
+            except Exception as err:
+                print(f"Watch for {self.plural} had an error: {err}")
+                self.stopped.wait(1)
+                resource_version = None
+
+    def handle_event(self, event):
+        """
+        Apply a watch event to the cache, and return the new resource version.
+        """
+        minicluster = event["object"]
+        name = minicluster["metadata"]["name"]
+        accepted = False
+        with self.lock:
+            if event["type"] == "DELETED":
+                self.items.pop(name, None)
+            elif is_newer(self.items.get(name), minicluster):
+                self.items[name] = minicluster
+                accepted = True
+        if accepted:
+            self.notify(minicluster)
+        return minicluster["metadata"].get("resourceVersion")
+
+
+class KubernetesBackend(Backend):
+    """
+    A KubernetesBackend stores MiniClusters as custom resources, and is
+    expecting to be in a Kubernetes cluster.
+    """
+
+    name = "kubernetes"
+
+    def __init__(self, pool_size=None):
+        # Connections kept to the API server, one per worker is reasonable
+        self.pool_size = pool_size or defaults.workers
+
+    @property
+    def api_client(self):
+        """
+        The API client is created once, and shares a pool of connections.
+        """
+        if hasattr(self, "_api_client"):
+            return self._api_client
+        config.load_incluster_config()
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = self.pool_size
+        self._api_client = client.ApiClient(configuration)
+        return self._api_client
+
+    @property
+    def client(self):
+        if hasattr(self, "_client"):
+            return self._client
+        self._client = client.CoreV1Api(self.api_client)
+        return self._client
+
+    @property
+    def custom_resource_client(self):
+        if hasattr(self, "_custom_resource_client"):
+            return self._custom_resource_client
+        self._custom_resource_client = client.CustomObjectsApi(self.api_client)
+        return self._custom_resource_client
+
+    def get_k8s(self):
+        """
+        Get the custom resource client, created from an in cluster config.
+        """
+        try:
+            return self.custom_resource_client
+        except Exception as err:
+            raise ValueError(f"Cannot create an in cluster Kubernetes client: {err}")
+
+    def create_cache(self, namespace, group, version, plural, on_update=None):
+        return MiniClusterCache(
+            self.get_k8s(), namespace, group, version, plural, on_update=on_update
+        ).start()
+
+    def get_minicluster(self, namespace, plural, name, group, version):
+        """
+        Get the minicluster in the namespace (works via custom rbac and service account)
+        """
+        k8s = self.get_k8s()
+        try:
+            return k8s.get_namespaced_custom_object(
+                group=group,
+                version=version,
+                plural=plural,
+                namespace=namespace,
+                name=name,
+            )
+        except ApiException as err:
+            if err.status == 404:
+                raise ValueError(f"MiniCluster with name {name} was not found")
+            raise ValueError(f"Cannot get MiniCluster: {err}")
+
+    def update_size(self, minicluster, size, plural="miniclusters"):
+        """
+        Patch the MiniCluster to a new size.
+        """
+        k8s = self.get_k8s()
+
+        # Derive the group and version from apiVersion
+        api_version = minicluster["apiVersion"]
+        group, version = api_version.split("/", 1)
+
+        # We create a patch to adjust the size. Including the resource version
+        # means the patch is rejected (409) if the MiniCluster changed since we read it
+        patch = {
+            "metadata": {"resourceVersion": minicluster["metadata"]["resourceVersion"]},
+            "spec": {"size": size},
+        }
+        try:
+            return k8s.patch_namespaced_custom_object(
+                group=group,
+                version=version,
+                plural=plural,
+                name=minicluster["metadata"]["name"],
+                namespace=minicluster["metadata"]["namespace"],
+                body=patch,
+            )
+        except ApiException as err:
+            if err.status == 409:
+                raise ResizeConflict(f"MiniCluster {minicluster['metadata']['name']} was modified")
+            raise ValueError(f"Issue patching MiniCluster: {err}")
+        except Exception as err:
+            raise ValueError(f"Issue patching MiniCluster: {err}")
@@ -0,0 +1,209 @@
+import json
+import random
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from ensemble.members.client import create_action_request
+from ensemble.protos import ensemble_service_pb2
+from ensemble.protos import ensemble_service_pb2_grpc as api
+
+# Simulated MiniClusters (on a local server) start here, with bounds that
+# are not reached unless they are changed
+start_size = 1000
+max_size = 1000000000
+
+
+def percentile(values, quantile):
+    """
+    Get a percentile from a sorted list of values.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, int(quantile * len(values)))
+    return values[index]
+
+
+class LoadGenerator:
+    """
+    A LoadGenerator sends grow and shrink requests to the ensemble service
+    from a number of simulated members, at a target rate (requests per second).
+
+    Latency is measured from when a request was scheduled to be sent, so time
+    spent waiting on a busy client is counted too. At the end we check that
+    the size of each MiniCluster changed by exactly the sum of the requests
+    that succeeded. A request that hits the bounds of a MiniCluster is
+    clamped, and the order requests were applied in is not known, so if the
+    requests for a MiniCluster could have reached its bounds we can only
+    check that it ended within them (it is counted as unchecked).
+    """
+
+    def __init__(
+        self,
+        host,
+        members=10,
+        rate=100,
+        duration=10,
+        concurrency=32,
+        seed=None,
+        plural="miniclusters",
+    ):
+        self.host = host
+        self.members = [f"loadgen-{i}" for i in range(members)]
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.plural = plural
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.results = []
+
+    @property
+    def payload(self):
+        return {"version": "v1alpha2", "group": "flux-framework.org"}
+
+    def request(self, name, delta):
+        """
+        Create the action request for a change in size.
+        """
+        action = "grow" if delta > 0 else "shrink"
+        payload = self.payload
+        payload[action] = abs(delta)
+        return create_action_request(self.plural, name, action, payload)
+
+    def get_status(self, stub, name):
+        """
+        Get the status (size and bounds) of a MiniCluster from the service.
+        """
+        response = stub.RequestStatus(
+            ensemble_service_pb2.StatusRequest(member=self.plural, name=name)
+        )
+        if response.status != ensemble_service_pb2.Response.ResultType.SUCCESS:
+            raise ValueError(f"Cannot get status for {name}")
+        return json.loads(response.payload)
+
+    def send(self, stub, name, delta, scheduled):
+        """
+        Send one request, and record the latency and status.
+        """
+        try:
+            status = stub.RequestAction(self.request(name, delta)).status
+        except grpc.RpcError as err:
+            status = err.code()
+        latency = time.time() - scheduled
+        with self.lock:
+            self.results.append((name, delta, status, latency))
+
+    def run(self):
+        """
+        Run the load, and return a report.
+        """
+        channel = grpc.insecure_channel(self.host)
+        stub = api.EnsembleOperatorStub(channel)
+
+        # One (untimed) request per member, so the service knows about it
+        for name in self.members:
+            stub.RequestAction(self.request(name, 1))
+        initial = {name: self.get_status(stub, name) for name in self.members}
+
+        total = int(self.rate * self.duration)
+        executor = futures.ThreadPoolExecutor(max_workers=self.concurrency)
+        start = time.time()
+        for i in range(total):
+            scheduled = start + i / self.rate
+            wait = scheduled - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            name = self.random.choice(self.members)
+            delta = self.random.choice([-3, -2, -1, 1, 2, 3])
+            executor.submit(self.send, stub, name, delta, scheduled)
+        executor.shutdown(wait=True)
+        elapsed = time.time() - start
+
+        final = {name: self.get_status(stub, name)["size"] for name in self.members}
+        channel.close()
+        return self.report(initial, final, elapsed)
+
+    def report(self, initial, final, elapsed):
+        """
+        Summarize latency, errors, and if the final sizes are correct.
+        """
+        result_type = ensemble_service_pb2.Response.ResultType
+        expected = {name: status["size"] for name, status in initial.items()}
+        grown = {name: 0 for name in self.members}
+        shrunk = {name: 0 for name in self.members}
+        errors = denied = 0
+        for name, delta, status, _ in self.results:
+            if status == result_type.SUCCESS:
+                expected[name] += delta
+                if delta > 0:
+                    grown[name] += delta
+                else:
+                    shrunk[name] -= delta
+            elif status == result_type.DENIED:
+                denied += 1
+            else:
+                errors += 1
+
+        latencies = sorted(result[-1] for result in self.results)
+        wrong = {}
+        unchecked = 0
+        for name in self.members:
+            size = initial[name]["size"]
+            min_size = initial[name].get("min_size") or 1
+            max_size = initial[name].get("max_size")
+
+            # If we could have been clamped, we can only check the bounds
+            if size - shrunk[name] < min_size or (
+                max_size is not None and size + grown[name] > max_size
+            ):
+                unchecked += 1
+                if final[name] < min_size or (max_size is not None and final[name] > max_size):
+                    wrong[name] = {"expected": f"{min_size}-{max_size}", "actual": final[name]}
+            elif expected[name] != final[name]:
+                wrong[name] = {"expected": expected[name], "actual": final[name]}
+        return {
+            "members": len(self.members),
+            "requests": len(self.results),
+            "errors": errors,
+            "denied": denied,
+            "elapsed": elapsed,
+            "rate": len(self.results) / elapsed if elapsed else 0,
+            "latency": {
+                "p50": percentile(latencies, 0.5),
+                "p90": percentile(latencies, 0.9),
+                "p99": percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None,
+            },
+            "correct": not wrong,
+            "unchecked": unchecked,
+            "wrong": wrong,
+        }
+
+
+def show_report(report):
+    """
+    Print a load generator report.
+    """
+    print(f"      Members: {report['members']}")
+    print(
+        f"     Requests: {report['requests']} ({report['errors']} errors, {report['denied']} denied)"
+    )
+    print(f"         Rate: {report['rate']:.1f} requests/second over {report['elapsed']:.1f}s")
+    for name, value in report["latency"].items():
+        value = f"{value * 1000:.2f} ms" if value is not None else "n/a"
+        print(f"  Latency {name}: {value}")
+    unchecked = ""
+    if report["unchecked"]:
+        unchecked = (
+            f" ({report['unchecked']} could reach their bounds, and are only checked for them)"
+        )
+    if report["correct"]:
+        print(f"   Final size: correct for all members{unchecked}")
+    else:
+        print(f"   Final size: WRONG for {len(report['wrong'])} members")
+        for name, sizes in report["wrong"].items():
+            print(f"      {name}: expected {sizes['expected']}, actual {sizes['actual']}")
@@ -0,0 +1,80 @@
+import copy
+import itertools
+import threading
+import time
+
+from ensemble.service.backend import Backend
+from ensemble.service.resize import ResizeConflict
+
+
+class MemoryBackend(Backend):
+    """
+    A MemoryBackend keeps MiniClusters in memory, and stands in for
+    Kubernetes to run (and load test) the service outside of a cluster.
+
+    Resource versions increase with every update, so conflicts behave like
+    they do with the API server. MiniClusters that are not known are created
+    on first lookup with the default size and bounds (unless create is False),
+    and latency (seconds) can be added to every call to act like a remote API.
+    """
+
+    name = "memory"
+
+    def __init__(self, size=1, min_size=1, max_size=100, create=True, latency=0):
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.create = create
+        self.latency = latency
+
+        self.lock = threading.Lock()
+        self.items = {}
+        self.versions = itertools.count(1)
+
+    def add(self, namespace, plural, name, group, version, size=None, min_size=None, max_size=None):
+        """
+        Add a MiniCluster, returning it.
+        """
+        minicluster = {
+            "apiVersion": f"{group}/{version}",
+            "kind": "MiniCluster",
+            "metadata": {
+                "name": name,
+                "namespace": namespace,
+                "resourceVersion": str(next(self.versions)),
+            },
+            "spec": {
+                "size": size if size is not None else self.size,
+                "minSize": min_size if min_size is not None else self.min_size,
+                "maxSize": max_size if max_size is not None else self.max_size,
+            },
+        }
+        with self.lock:
+            self.items[(namespace, plural, name)] = minicluster
+        return copy.deepcopy(minicluster)
+
+    def get_minicluster(self, namespace, plural, name, group, version):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            minicluster = self.items.get((namespace, plural, name))
+            if minicluster is not None:
+                return copy.deepcopy(minicluster)
+        if not self.create:
+            raise ValueError(f"MiniCluster with name {name} was not found")
+        return self.add(namespace, plural, name, group, version)
+
+    def update_size(self, minicluster, size, plural="miniclusters"):
+        if self.latency:
+            time.sleep(self.latency)
+        metadata = minicluster["metadata"]
+        key = (metadata["namespace"], plural, metadata["name"])
+        with self.lock:
+            current = self.items.get(key)
+            if current is None:
+                raise ValueError(f"MiniCluster with name {metadata['name']} was not found")
+            if current["metadata"]["resourceVersion"] != metadata["resourceVersion"]:
+                raise ResizeConflict(f"MiniCluster {metadata['name']} was modified")
+            current["spec"]["size"] = size
+            current["metadata"]["resourceVersion"] = str(next(self.versions))
+            return copy.deepcopy(current)
@@ -0,0 +1,100 @@
+import threading
+
+import ensemble.defaults as defaults
+
+
+class ResizeConflict(Exception):
+    """
+    The MiniCluster changed between reading it and patching it.
+    """
+
+    pass
+
+
+class ResizeRequest:
+    """
+    A resize request is one change in size waiting to be applied.
+    """
+
+    def __init__(self, delta):
+        self.delta = delta
+        self.done = False
+
+        # Set when the request is applied (with others in its batch)
+        self.previous = None
+        self.size = None
+        self.batch = 0
+        self.error = None
+
+
+class ResizeQueue:
+    """
+    The resize queue serializes resizes for each MiniCluster.
+
+    Requests wait on a lock for their MiniCluster. Whoever holds it applies
+    every request pending at that moment as one summed delta, so a burst
+    becomes a few patches instead of one per request. Requests that were
+    applied by someone else find themselves done when they get the lock.
+
+    Serializing within the service is not enough on its own (there might be
+    other writers), so the function that applies the change must patch with
+    the resource version it read, and raise ResizeConflict if the server
+    rejects it. We then read again and retry.
+    """
+
+    def __init__(self, retries=None):
+        self.retries = retries if retries is not None else defaults.resize_retries
+        self.lock = threading.Lock()
+        self.locks = {}
+        self.pending = {}
+
+    def get_lock(self, key):
+        with self.lock:
+            if key not in self.locks:
+                self.locks[key] = threading.Lock()
+            return self.locks[key]
+
+    def resize(self, key, delta, apply):
+        """
+        Request a change in size for a MiniCluster (key) and wait for it.
+
+        apply(delta, fresh) must read the MiniCluster (bypassing any cache
+        when fresh is True), patch it, and return the previous and new size.
+        """
+        request = ResizeRequest(delta)
+        with self.lock:
+            self.pending.setdefault(key, []).append(request)
+
+        with self.get_lock(key):
+            if not request.done:
+                with self.lock:
+                    batch = self.pending.pop(key, [])
+                self.apply_batch(batch, apply)
+
+        if request.error is not None:
+            raise request.error
+        return request
+
+    def apply_batch(self, batch, apply):
+        """
+        Apply the summed delta of a batch, retrying on conflict.
+        """
+        delta = sum(request.delta for request in batch)
+        previous = size = error = None
+        for attempt in range(self.retries + 1):
+            try:
+                previous, size = apply(delta, attempt > 0)
+                error = None
+                break
+            except ResizeConflict as err:
+                error = ValueError(f"Resize conflict after {attempt + 1} attempts: {err}")
+            except Exception as err:
+                error = err
+                break
+
+        for request in batch:
+            request.previous = previous
+            request.size = size
+            request.batch = len(batch)
+            request.error = error
+            request.done = True
@@ -0,0 +1,97 @@
+import threading
+import time
+
+from ensemble.service.backend import is_newer
+
+
+class StatusCache:
+    """
+    The StatusCache holds what the service knows about each member, so a
+    status request can be answered without asking the Kubernetes API.
+
+    It is updated by the service's own writes (resizes it starts and
+    finishes) and by the MiniCluster watch (changes made by anyone else).
+    Members are keyed by "<member>/<name>", the same as streams.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = {}
+
+    def get_item(self, key):
+        """
+        Get (or create) the status for a member. The lock must be held.
+        """
+        if key not in self.items:
+            self.items[key] = {
+                "size": None,
+                "min_size": None,
+                "max_size": None,
+                "resource_version": None,
+                "pending": 0,
+                "pending_delta": 0,
+                "last_action": None,
+                "updated": None,
+            }
+        return self.items[key]
+
+    def update_minicluster(self, key, minicluster):
+        """
+        Update size and bounds from a MiniCluster object.
+        """
+        spec = minicluster.get("spec", {})
+        with self.lock:
+            item = self.get_item(key)
+
+            # Don't go back in time if an older version arrives late
+            current = {"metadata": {"resourceVersion": item["resource_version"]}}
+            if item["resource_version"] is not None and not is_newer(current, minicluster):
+                return
+            item["size"] = spec.get("size")
+            item["min_size"] = spec.get("minSize")
+            item["max_size"] = spec.get("maxSize")
+            item["resource_version"] = minicluster["metadata"].get("resourceVersion")
+            item["updated"] = time.time()
+
+    def start_action(self, key, action, delta):
+        """
+        Record a resize that was requested and has not landed yet.
+        """
+        with self.lock:
+            item = self.get_item(key)
+            item["pending"] += 1
+            item["pending_delta"] += delta
+
+    def finish_action(self, key, action, delta, previous=None, size=None, error=None):
+        """
+        Record a resize that finished (or failed), and the size it left.
+        """
+        now = time.time()
+        with self.lock:
+            item = self.get_item(key)
+            item["pending"] = max(0, item["pending"] - 1)
+            item["pending_delta"] -= delta
+            item["last_action"] = {
+                "action": action,
+                "delta": delta,
+                "previous": previous,
+                "size": size,
+                "error": str(error) if error is not None else None,
+                "timestamp": now,
+            }
+            if error is None and size is not None:
+                item["size"] = size
+                item["updated"] = now
+
+    def get(self, key):
+        """
+        Get a copy of the status for a member, or None if we know nothing.
+        """
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return
+            item = dict(item)
+        if item["last_action"] is not None:
+            item["last_action"] = dict(item["last_action"])
+        return item
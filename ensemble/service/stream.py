@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class MemberStreams:
+    """
+    MemberStreams keeps track of members with a live stream to the service.
+
+    Each stream has an outbox (a queue) that the stream handler yields
+    from, so the service can send a member a message (e.g., a command) at
+    any time. We also keep the last metric digest each member sent, which
+    gives the service a live view of every member.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outboxes = {}
+        self.digests = {}
+
+    def register(self, key, outbox):
+        """
+        Register a new stream for a member. A member that reconnects
+        replaces the older stream.
+        """
+        with self.lock:
+            self.outboxes[key] = outbox
+        print(f"🌊 Member {key} opened a stream")
+
+    def unregister(self, key, outbox):
+        """
+        Remove a stream, unless it was already replaced by a newer one.
+        """
+        with self.lock:
+            if self.outboxes.get(key) is outbox:
+                del self.outboxes[key]
+        print(f"🌊 Member {key} closed a stream")
+
+    def record_digest(self, key, digest):
+        """
+        Keep the last metric digest for the member.
+        """
+        self.digests[key] = {
+            "payload": digest.payload,
+            "timestamp": digest.timestamp,
+            "received": time.time(),
+        }
+
+    def send(self, key, message):
+        """
+        Send a message to a member, returning False if it has no stream.
+        """
+        with self.lock:
+            outbox = self.outboxes.get(key)
+        if outbox is None:
+            return False
+        outbox.put(message)
+        return True
+
+    @property
+    def members(self):
+        with self.lock:
+            return list(self.outboxes)
@@ -36,6 +36,13 @@ def read_yaml(filename):
     return content
 
 
+def read_yaml_string(content):
+    """
+    Read yaml from a string (or bytes)
+    """
+    return yaml.safe_load(content)
+
+
 def write_yaml(obj, filename):
     """
     Read yaml to file
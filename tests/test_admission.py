@@ -0,0 +1,55 @@
+import argparse
+from concurrent import futures
+
+import grpc
+
+from ensemble.members.client import create_action_request
+from ensemble.protos import ensemble_service_pb2
+from ensemble.protos import ensemble_service_pb2_grpc as api
+from ensemble.server import KubernetesEnsemble, get_admission
+from ensemble.service.memory import MemoryBackend
+
+workers = 3
+
+
+def get_args(max_in_flight=100):
+    return argparse.Namespace(max_in_flight=max_in_flight, member_rate=0, member_burst=None)
+
+
+def test_max_in_flight_is_below_workers():
+    assert get_admission(get_args(), workers=workers).max_in_flight == workers - 1
+    assert get_admission(get_args(1), workers=workers).max_in_flight == 1
+    assert get_admission(get_args(0), workers=workers).max_in_flight == 0
+    assert get_admission(get_args()).max_in_flight == 100
+
+
+def test_overload_is_denied():
+    """
+    More requests than workers are denied, and not left waiting in the pool.
+    """
+    endpoint = KubernetesEnsemble(
+        backend=MemoryBackend(max_size=1000, latency=1),
+        admission=get_admission(get_args(), workers=workers),
+    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    api.add_EnsembleOperatorServicer_to_server(endpoint, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+
+    def grow(name):
+        payload = {"version": "v1alpha2", "group": "flux-framework.org", "grow": 1}
+        request = create_action_request("miniclusters", name, "grow", payload)
+        return stub.RequestAction(request, timeout=10).status
+
+    try:
+        channel = grpc.insecure_channel(f"localhost:{port}")
+        stub = api.EnsembleOperatorStub(channel)
+        with futures.ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(grow, [f"member-{i}" for i in range(8)]))
+    finally:
+        server.stop(None)
+
+    result = ensemble_service_pb2.Response.ResultType
+    assert statuses.count(result.DENIED) >= 8 - (workers - 1)
+    assert statuses.count(result.SUCCESS) <= workers - 1
+    assert endpoint.admission.denied == statuses.count(result.DENIED)
@@ -0,0 +1,65 @@
+from ensemble.service.arbiter import FairShareArbiter
+
+
+def get_arbiter():
+    """
+    With a budget of 10, a is granted 8, and b asks for 8 (2 granted, 6 queued).
+    a then asks for 2 more, and all of it is queued.
+    """
+    arbiter = FairShareArbiter(10)
+    assert arbiter.request("a", 8) == (8, 0)
+    assert arbiter.request("b", 8) == (2, 6)
+    assert arbiter.request("a", 2) == (0, 2)
+    return arbiter
+
+
+def test_shrink_is_shared_fairly():
+    """
+    When a shrinks to 3, the freed nodes bring both members to their share.
+    """
+    arbiter = get_arbiter()
+    grants = arbiter.update("a", 3)
+    assert sorted(grants) == [("a", 2), ("b", 3)]
+    assert arbiter.get("a")["allocated"] == 5
+    assert arbiter.get("b")["allocated"] == 5
+    assert arbiter.get("a")["queued"] == 0
+    assert arbiter.get("b")["queued"] == 3
+    assert arbiter.free == 0
+
+
+def test_stale_entries_are_dropped():
+    """
+    Pressure updates to queued members don't pile up entries in the heap.
+    """
+    arbiter = get_arbiter()
+    for pressure in range(100):
+        arbiter.update_pressure("b", pressure)
+    assert len(arbiter.heap) <= 2 * len(arbiter.waiting) + 16
+    assert sorted(arbiter.update("a", 3)) == [("a", 2), ("b", 3)]
+
+
+def test_pressure_breaks_ties():
+    """
+    With equal usage, the member with more pending jobs is served first.
+    """
+    arbiter = FairShareArbiter(4)
+    assert arbiter.request("a", 4) == (4, 0)
+    assert arbiter.request("b", 2) == (0, 2)
+    assert arbiter.request("c", 2) == (0, 2)
+    arbiter.update_pressure("c", 10)
+    assert arbiter.update("a", 3) == [("c", 1)]
+
+
+def test_over_share_is_granted_one_at_a_time():
+    """
+    If everyone waiting is at their share, free nodes still go by usage.
+    """
+    arbiter = FairShareArbiter(4)
+    assert arbiter.request("a", 2) == (2, 0)
+    assert arbiter.request("b", 2) == (2, 0)
+    assert arbiter.request("a", 2) == (0, 2)
+    assert arbiter.request("b", 2) == (0, 2)
+    grants = arbiter.update("a", 0) + arbiter.update("b", 0)
+    assert arbiter.get("a")["allocated"] == 2
+    assert arbiter.get("b")["allocated"] == 2
+    assert sum(granted for _, granted in grants) == 4
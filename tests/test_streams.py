@@ -0,0 +1,71 @@
+import argparse
+import time
+from concurrent import futures
+
+import grpc
+
+from ensemble.members.client import MemberStream, create_action_request
+from ensemble.protos import ensemble_service_pb2
+from ensemble.protos import ensemble_service_pb2_grpc as api
+from ensemble.server import KubernetesEnsemble, get_admission, get_max_streams
+from ensemble.service.memory import MemoryBackend
+
+workers = 4
+
+
+def get_args(max_streams=None):
+    return argparse.Namespace(
+        asyncio=False,
+        workers=workers,
+        max_streams=max_streams,
+        max_in_flight=100,
+        member_rate=0,
+        member_burst=None,
+    )
+
+
+def test_streams_leave_workers_for_requests():
+    assert get_max_streams(get_args()) == workers // 2
+    assert get_max_streams(get_args(100)) == workers - 2
+    args = get_args()
+    admission = get_admission(args, workers=workers, streams=get_max_streams(args))
+    assert admission.max_in_flight == 1
+
+
+def test_stream_over_limit_is_refused():
+    """
+    Streams over the limit are refused, and requests are still answered.
+    """
+    args = get_args()
+    max_streams = get_max_streams(args)
+    endpoint = KubernetesEnsemble(
+        backend=MemoryBackend(max_size=1000),
+        admission=get_admission(args, workers=workers, streams=max_streams),
+        max_streams=max_streams,
+    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    api.add_EnsembleOperatorServicer_to_server(endpoint, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    host = f"localhost:{port}"
+    payload = {"version": "v1alpha2", "group": "flux-framework.org", "grow": 1}
+
+    streams = []
+    try:
+        for i in range(max_streams):
+            streams.append(MemberStream(host, "miniclusters", f"member-{i}"))
+            streams[-1].send_digest({}).result(timeout=10)
+        streams.append(MemberStream(host, "miniclusters", "member-refused"))
+        time.sleep(0.5)
+        assert [stream.closed for stream in streams] == [False] * max_streams + [True]
+        assert endpoint.open_streams == max_streams
+
+        # A request (not on a stream) does not wait for a worker
+        stub = api.EnsembleOperatorStub(grpc.insecure_channel(host))
+        request = create_action_request("miniclusters", "member-0", "grow", payload)
+        response = stub.RequestAction(request, timeout=10)
+        assert response.status == ensemble_service_pb2.Response.ResultType.SUCCESS
+    finally:
+        for stream in streams:
+            stream.close()
+        server.stop(None)